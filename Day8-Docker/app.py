@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+from flask import Flask, Response, g, jsonify, request
+from scoring import STARTUP_TIMINGS, load_scorer
+from batching import MicroBatcher
+from metrics import REGISTRY, REQUEST_LATENCY, STAGE_LATENCY
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("app")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "app.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+# maximum number of messages accepted in one /predict request
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+# single-message requests are coalesced into micro-batches of at most
+# MICRO_BATCH_SIZE messages, waiting at most MICRO_BATCH_WAIT_MS for more
+MICRO_BATCH_SIZE = int(os.environ.get("MICRO_BATCH_SIZE", "32"))
+MICRO_BATCH_WAIT_MS = float(os.environ.get("MICRO_BATCH_WAIT_MS", "5"))
+PREDICT_TIMEOUT_S = float(os.environ.get("PREDICT_TIMEOUT_S", "10"))
+
+app = Flask(__name__)
+
+# loaded once when the worker imports the app, not per request
+scorer = load_scorer()
+batcher = MicroBatcher(scorer.predict, MICRO_BATCH_SIZE, MICRO_BATCH_WAIT_MS)
+
+# read when /metrics is scraped; with several gunicorn workers they are
+# merged over all workers, see metrics.py
+REGISTRY.counter("prediction_cache_hits_total", "Prediction cache hits.", lambda: scorer.cache.stats()["hits"])
+REGISTRY.counter("prediction_cache_misses_total", "Prediction cache misses.", lambda: scorer.cache.stats()["misses"])
+REGISTRY.gauge("prediction_cache_hit_rate", "Share of cache lookups that hit.", lambda: scorer.cache.stats()["hit_rate"])
+REGISTRY.gauge("micro_batch_queue_depth", "Messages waiting for the micro-batcher.", batcher.qsize,
+               multiprocess="sum")
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    if "start" in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.start,
+                                endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
+def serialize(**payload):
+    with STAGE_LATENCY.time(stage="serialize"):
+        return jsonify(**payload)
+
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify(status="ok")
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # the scorer is loaded and warmed up before the app accepts requests
+    return jsonify(ready=True, startup_s=STARTUP_TIMINGS)
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(prediction_cache=scorer.cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    Score a batch of messages: {"messages": ["...", ...]}
+    Returns one {"label", "probabilities"} entry per message, in order.
+    A single message, {"message": "..."}, goes through the micro-batcher and
+    returns {"prediction": {...}}.
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify(error="expected a json object"), 400
+    if "message" in payload:
+        message = payload["message"]
+        if not isinstance(message, str):
+            return jsonify(error="'message' must be a string"), 400
+        try:
+            return serialize(prediction=batcher.submit(message).result(timeout=PREDICT_TIMEOUT_S))
+        except Exception as e:
+            logger.error(f"Prediction failed: {e}")
+            return jsonify(error="prediction failed"), 500
+
+    messages = payload.get("messages")
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify(error="expected a json body with a 'messages' list of strings"), 400
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify(error=f"at most {MAX_BATCH_SIZE} messages per request"), 413
+    if not messages:
+        return jsonify(predictions=[])
+    try:
+        return serialize(predictions=scorer.predict(messages))
+    except Exception as e:
+        logger.error(f"Prediction failed: {e}")
+        return jsonify(error="prediction failed"), 500
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8000)
@@ -0,0 +1,173 @@
+# asyncio front end for the scoring service:
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+#
+# Connections are handled on the event loop, so slow clients cost a
+# coroutine instead of a worker thread. The CPU-bound predict calls run on a
+# bounded thread pool, and once MAX_PENDING requests are in flight new ones
+# get a 503 straight away instead of piling up. Single-message requests are
+# coalesced into micro-batches on the loop, like the Flask app does.
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from scoring import STARTUP_TIMINGS, load_scorer
+from batching import AsyncMicroBatcher
+from metrics import REGISTRY, REQUEST_LATENCY, STAGE_LATENCY
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("asgi_app")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "asgi_app.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "1000"))
+MAX_BODY_BYTES = int(os.environ.get("MAX_BODY_BYTES", str(1 << 20)))
+# threads running predict calls, and requests allowed to wait for one
+MODEL_THREADS = int(os.environ.get("MODEL_THREADS", "2"))
+MAX_PENDING = int(os.environ.get("MAX_PENDING", "64"))
+MICRO_BATCH_SIZE = int(os.environ.get("MICRO_BATCH_SIZE", "32"))
+MICRO_BATCH_WAIT_MS = float(os.environ.get("MICRO_BATCH_WAIT_MS", "5"))
+
+scorer = load_scorer()
+executor = ThreadPoolExecutor(max_workers=MODEL_THREADS, thread_name_prefix="predict")
+batcher = AsyncMicroBatcher(scorer.predict, executor, MICRO_BATCH_SIZE, MICRO_BATCH_WAIT_MS)
+pending = 0
+
+REGISTRY.counter("prediction_cache_hits_total", "Prediction cache hits.", lambda: scorer.cache.stats()["hits"])
+REGISTRY.counter("prediction_cache_misses_total", "Prediction cache misses.", lambda: scorer.cache.stats()["misses"])
+REGISTRY.gauge("prediction_cache_hit_rate", "Share of cache lookups that hit.", lambda: scorer.cache.stats()["hit_rate"])
+REGISTRY.gauge("micro_batch_queue_depth", "Messages waiting for the micro-batcher.", batcher.qsize,
+               multiprocess="sum")
+REGISTRY.gauge("predict_requests_pending", "Predict requests in flight.", lambda: pending, multiprocess="sum")
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        if not message.get("more_body", False):
+            return body
+
+
+async def send_json(send, status, payload, headers=()):
+    with STAGE_LATENCY.time(stage="serialize"):
+        body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_metrics(send):
+    body = REGISTRY.render().encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/plain; version=0.0.4"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def predict(receive, send):
+    global pending
+    body = await read_body(receive)
+    if body is None:
+        return await send_json(send, 413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"})
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return await send_json(send, 400, {"error": "expected a json object"})
+
+    single = "message" in payload
+    messages = [payload["message"]] if single else payload.get("messages")
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return await send_json(send, 400, {"error": "expected a 'message' string or a 'messages' list of strings"})
+    if len(messages) > MAX_BATCH_SIZE:
+        return await send_json(send, 413, {"error": f"at most {MAX_BATCH_SIZE} messages per request"})
+    if not messages:
+        return await send_json(send, 200, {"predictions": []})
+
+    if pending >= MAX_PENDING:
+        return await send_json(send, 503, {"error": "overloaded, retry later"}, [(b"retry-after", b"1")])
+    pending += 1
+    try:
+        if single:
+            predictions = [await batcher.submit(messages[0])]
+        else:
+            predictions = await asyncio.get_running_loop().run_in_executor(executor, scorer.predict, messages)
+    except Exception as e:
+        logger.error(f"Prediction failed: {e}")
+        return await send_json(send, 500, {"error": "prediction failed"})
+    finally:
+        pending -= 1
+    if single:
+        return await send_json(send, 200, {"prediction": predictions[0]})
+    return await send_json(send, 200, {"predictions": predictions})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    start = time.perf_counter()
+    status = []
+
+    async def send_and_record(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        await send(message)
+
+    route = (scope["method"], scope["path"])
+    await dispatch(route, receive, send_and_record)
+    endpoint = scope["path"].strip("/") if status and status[0] != 404 else "unknown"
+    REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, status=status[0] if status else 500)
+
+
+async def dispatch(route, receive, send):
+    if route == ("GET", "/health"):
+        await send_json(send, 200, {"status": "ok"})
+    elif route == ("GET", "/ready"):
+        await send_json(send, 200, {"ready": True, "startup_s": STARTUP_TIMINGS})
+    elif route == ("GET", "/stats"):
+        await send_json(send, 200, {"prediction_cache": scorer.cache.stats(), "pending": pending})
+    elif route == ("GET", "/metrics"):
+        await send_metrics(send)
+    elif route == ("POST", "/predict"):
+        await predict(receive, send)
+    else:
+        await send_json(send, 404, {"error": "not found"})
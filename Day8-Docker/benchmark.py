@@ -0,0 +1,59 @@
+# Load test a running scoring service, e.g. the Flask and the asyncio front end:
+#   python benchmark.py --url http://localhost:8000/predict --requests 2000 --concurrency 64
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"content-type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError) as e:
+        # refused or reset connections and timeouts are counted by the name
+        # of the error instead of an http status
+        reason = getattr(e, "reason", None)
+        status = type(reason if isinstance(reason, Exception) else e).__name__
+    return status, time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def main(url, n_requests, concurrency, unique):
+    payloads = [{"message": f"WINNER!! claim your free prize number {i % unique} now"} for i in range(n_requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda payload: post(url, payload), payloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for status, latency in results if status == 200]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{url}: {n_requests} requests, concurrency {concurrency}, {elapsed:.2f}s")
+    print(f"  throughput {n_requests / elapsed:.1f} req/s, statuses {statuses}")
+    print(f"  latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the /predict endpoint")
+    parser.add_argument("--url", default="http://localhost:8000/predict")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--unique", type=int, default=2000,
+                        help="distinct messages sent, lower values exercise the prediction cache")
+    args = parser.parse_args()
+    main(args.url, args.requests, args.concurrency, args.unique)
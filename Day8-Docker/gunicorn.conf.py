@@ -0,0 +1,71 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app imports app.py, and so loads the model, once in the master
+# before the workers are forked. The forest's node arrays are never written
+# after loading, so the workers keep sharing those pages copy-on-write
+# instead of each unpickling its own copy.
+import os
+import gc
+import logging
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+# threads let the micro-batcher see concurrent requests inside a worker
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+preload_app = True
+
+# every worker writes its metrics here and /metrics serves them merged over
+# all workers; set before the app (and metrics.py) is loaded
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "spam-api-metrics"))
+
+logger = logging.getLogger("gunicorn.error")
+
+def memory_usage():
+    """rss, pss and shared memory of this process in MB (linux /proc)"""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                field, value = line.split(":", 1)
+                if field in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                    usage[field] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        usage["MaxRss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return usage
+    usage["Shared"] = usage.pop("Shared_Clean", 0) + usage.pop("Shared_Dirty", 0)
+    return usage
+
+def _format(usage):
+    return ", ".join(f"{field} {value:.1f} MB" for field, value in usage.items())
+
+def on_starting(server):
+    from metrics import clear_metrics_dir
+    clear_metrics_dir()
+
+def when_ready(server):
+    logger.info(f"master {os.getpid()} ready with the model loaded: {_format(memory_usage())}")
+
+def pre_fork(server, worker):
+    # move everything loaded so far out of the gc's reach, so collections in
+    # the workers do not touch (and copy) the pages shared with the master
+    gc.freeze()
+
+def post_fork(server, worker):
+    # the warm-up in the master is not a request served by this worker
+    from metrics import REGISTRY
+    REGISTRY.clear()
+
+def post_worker_init(worker):
+    from metrics import REGISTRY
+    REGISTRY.start_snapshots()
+    logger.info(f"worker {worker.pid} started: {_format(memory_usage())}")
+
+def worker_exit(server, worker):
+    from metrics import REGISTRY
+    REGISTRY.write_snapshot()
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,232 @@
+# Minimal in-process metrics rendered in the Prometheus text format.
+# Observing a value is one bisect and a few integer updates under a lock,
+# cheap enough to do for every request and every scoring stage.
+#
+# Every process has its own copy of the metrics. With METRICS_DIR set (the
+# gunicorn config sets it), each worker writes a snapshot of its metrics to
+# METRICS_DIR/<pid>.json every METRICS_SNAPSHOT_INTERVAL_S seconds and on
+# every scrape, and /metrics serves the snapshots of all workers merged:
+# histograms and counters are summed, gauges are summed or kept as one
+# series per worker with a pid label.
+import os
+import glob
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+SNAPSHOT_INTERVAL_S = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL_S", "1"))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    """cumulative-bucket histogram, one series per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def collect(self):
+        """{label key: (bucket counts, sum, count)}"""
+        with self._lock:
+            return {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+
+    @staticmethod
+    def merge(values):
+        counts = [sum(bucket_counts) for bucket_counts in zip(*(counts for counts, _, _ in values))]
+        return counts, sum(total for _, total, _ in values), sum(count for _, _, count in values)
+
+    def render(self, series=None):
+        series = self.collect() if series is None else series
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    value read from a callable when the metrics are scraped. multiprocess
+    says how the values of several workers are merged: "all" keeps one
+    series per worker with a pid label, "sum" adds them up.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, read, multiprocess="all"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.multiprocess = multiprocess
+
+    def clear(self):
+        pass
+
+    def collect(self):
+        return {(): self.read()}
+
+    @staticmethod
+    def merge(values):
+        return sum(values)
+
+    def render(self, series=None):
+        series = self.collect() if series is None else series
+        return [f"{self.name}{_format_labels(dict(key))} {value}" for key, value in sorted(series.items())]
+
+
+class Counter(Gauge):
+    """monotonic total read from a callable when the metrics are scraped"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, read):
+        super().__init__(name, help, read, multiprocess="sum")
+
+
+class Registry:
+    def __init__(self, metrics_dir=METRICS_DIR):
+        self.metrics = []
+        self.metrics_dir = metrics_dir
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name, help, read, multiprocess="all"):
+        return self.register(Gauge(name, help, read, multiprocess))
+
+    def counter(self, name, help, read):
+        return self.register(Counter(name, help, read))
+
+    def clear(self):
+        """drop what was observed so far, e.g. what a forked worker inherited"""
+        for metric in self.metrics:
+            metric.clear()
+
+    def write_snapshot(self):
+        """write this process's metrics to metrics_dir/<pid>.json"""
+        snapshot = {metric.name: [[key, value] for key, value in metric.collect().items()]
+                    for metric in self.metrics}
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    def start_snapshots(self, interval_s=SNAPSHOT_INTERVAL_S):
+        """write a snapshot every interval_s seconds from a daemon thread"""
+        def work():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    self.write_snapshot()
+                except OSError:
+                    pass
+
+        threading.Thread(target=work, name="metrics-snapshot", daemon=True).start()
+
+    def _merged(self):
+        """{metric name: {label key: value}} merged over the snapshots of all workers"""
+        self.write_snapshot()
+        values = {metric.name: {} for metric in self.metrics}
+        for path in glob.glob(os.path.join(self.metrics_dir, "*.json")):
+            pid, _, suffix = os.path.basename(path).partition(".")
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in self.metrics:
+                for key, value in snapshot.get(metric.name, []):
+                    key = tuple(tuple(pair) for pair in key)
+                    if metric.kind == "gauge":
+                        # the gauges of a worker that exited are gone with it
+                        if suffix != "json":
+                            continue
+                        if metric.multiprocess == "all":
+                            key += (("pid", pid),)
+                    values[metric.name].setdefault(key, []).append(value)
+        by_name = {metric.name: metric for metric in self.metrics}
+        return {name: {key: by_name[name].merge(series) for key, series in keys.items()}
+                for name, keys in values.items()}
+
+    def render(self):
+        merged = self._merged() if self.metrics_dir else {}
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(merged.get(metric.name)))
+        return "\n".join(lines) + "\n"
+
+
+def clear_metrics_dir(metrics_dir=METRICS_DIR):
+    """remove the snapshots left by a previous run"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(path)
+
+
+def mark_process_dead(pid, metrics_dir=METRICS_DIR):
+    """keep the histograms and counters of an exited worker, drop its gauges"""
+    path = os.path.join(metrics_dir, f"{pid}.json")
+    if os.path.exists(path):
+        os.replace(path, os.path.join(metrics_dir, f"{pid}.dead.json"))
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Request latency by endpoint and status.")
+BATCH_SIZE = REGISTRY.histogram("scoring_batch_size", "Messages per scoring call.", SIZE_BUCKETS)
+STAGE_LATENCY = REGISTRY.histogram(
+    "scoring_stage_duration_seconds",
+    "Time spent per scoring stage (normalize, vectorize, predict, serialize).",
+)
@@ -0,0 +1,223 @@
+import time
+
+_import_start = time.perf_counter()
+
+import os
+import sys
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("scoring")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "scoring.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# defaults point at the repository layout, the image overrides them
+# the model is written by Day_5/src/train_model.py with the artifacts it needs
+MODEL_PATH = os.environ.get("MODEL_PATH", os.path.join(base_dir, "..", "Day_5", "spam_model_rf.joblib"))
+PIPELINE_SRC = os.environ.get("PIPELINE_SRC", os.path.join(base_dir, "..", "Day_5", "src"))
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join(PIPELINE_SRC, "artifacts"))
+# optional flat export of the same forest (Day_5/src/flat_forest.py), faster
+# than sklearn on small batches but slower on large ones: batches of at most
+# FLAT_MAX_BATCH texts go to it, larger ones to the sklearn model
+FLAT_MODEL_PATH = os.environ.get("FLAT_MODEL_PATH")
+FLAT_MAX_BATCH = int(os.environ.get("FLAT_MAX_BATCH", "48"))
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_TTL_S = float(os.environ.get("PREDICTION_CACHE_TTL_S", "3600"))
+
+# the text pipeline (normalizer, artifact store) is shared with Day_5
+sys.path.insert(0, os.path.abspath(PIPELINE_SRC))
+from text_normalizer import normalize_texts, load_resources
+from artifacts import load_artifact
+from metrics import BATCH_SIZE, STAGE_LATENCY
+
+# seconds spent in each startup phase, reported by the /ready endpoint
+STARTUP_TIMINGS = {"imports": time.perf_counter() - _import_start}
+
+WARM_UP_MESSAGES = [
+    "WINNER!! You have been selected to receive a free prize, call now to claim",
+    "Are we still meeting for lunch tomorrow? Let me know",
+    "URGENT: your account has been suspended, reply with your details",
+    "ok see you later",
+] * 8
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with a time-to-live, holding predictions keyed by a
+    hash of the normalized message text. maxsize=0 disables it.
+    """
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, ttl_s=PREDICTION_CACHE_TTL_S):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(normalized_text):
+        return hashlib.blake2b(normalized_text.encode(), digest_size=16).digest()
+
+    def get(self, key):
+        """cached value or None, counting the hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SpamScorer:
+    """
+    Model plus the fitted text pipeline it was trained with. predict() scores a
+    whole batch of messages with one normalize, one transform and one
+    predict_proba call. Messages whose normalized text was scored recently
+    are answered from the prediction cache and skip the model entirely.
+    With a flat export of the forest, both are kept loaded and batches of at
+    most flat_max_batch texts are scored with the flat one.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, artifact_dir=ARTIFACT_DIR, cache=None,
+                 flat_model_path=FLAT_MODEL_PATH, flat_max_batch=FLAT_MAX_BATCH):
+        self.cache = cache if cache is not None else PredictionCache()
+        self.flat_max_batch = flat_max_batch
+        self.timings = {}
+        start = time.perf_counter()
+        self.model = joblib.load(model_path)
+        self.flat_model = None
+        if flat_model_path:
+            # only imported when there is a flat export to serve
+            from flat_forest import FlatForest
+            self.flat_model = FlatForest.load(flat_model_path)
+        self.timings["model_load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.vectorizer = load_artifact("tfidf_vectorizer", artifact_dir)
+        self.label_encoder = load_artifact("label_encoder", artifact_dir)
+        self.timings["artifacts_load"] = time.perf_counter() - start
+
+        # stopwords and punkt come from the image, they are never downloaded here
+        start = time.perf_counter()
+        load_resources()
+        self.timings["nltk_load"] = time.perf_counter() - start
+        n_features = len(self.vectorizer.vocabulary_)
+        if getattr(self.model, "n_features_in_", n_features) != n_features:
+            raise ValueError(
+                f"model at {model_path} expects {self.model.n_features_in_} features "
+                f"but the tfidf_vectorizer artifact produces {n_features}"
+            )
+        if self.flat_model is not None and (
+                self.flat_model.n_features_in_ != self.model.n_features_in_
+                or not np.array_equal(self.flat_model.classes_, self.model.classes_)):
+            raise ValueError(f"flat model at {flat_model_path} is not an export of the model at {model_path}")
+        # class names in the order of the predict_proba columns
+        self.labels = [str(label) for label in self.label_encoder.inverse_transform(self.model.classes_)]
+        logger.info(f"Model loaded from {model_path} with classes {self.labels}"
+                    + (f", flat export from {flat_model_path}" if self.flat_model is not None else ""))
+
+    def warm_up(self, messages=WARM_UP_MESSAGES):
+        """score a synthetic batch so the first request does not pay for lazy initialization"""
+        start = time.perf_counter()
+        texts = normalize_texts(messages)
+        self._score(texts)
+        if self.flat_model is not None:
+            # small batches went to the flat forest, warm up sklearn as well
+            self.model.predict_proba(self.vectorizer.transform(texts))
+        self.timings["warm_up"] = time.perf_counter() - start
+
+    def _score(self, texts):
+        """results for already normalized texts, without the cache"""
+        with STAGE_LATENCY.time(stage="vectorize"):
+            X = self.vectorizer.transform(texts)
+        use_flat = self.flat_model is not None and len(texts) <= self.flat_max_batch
+        model = self.flat_model if use_flat else self.model
+        with STAGE_LATENCY.time(stage="predict"):
+            proba = model.predict_proba(X)
+        return [
+            {
+                "label": self.labels[row.argmax()],
+                "probabilities": dict(zip(self.labels, row.round(6).tolist())),
+            }
+            for row in proba
+        ]
+
+    def predict(self, messages):
+        """labels and class probabilities for a list of messages"""
+        BATCH_SIZE.observe(len(messages))
+        with STAGE_LATENCY.time(stage="normalize"):
+            texts = normalize_texts(messages)
+        keys = [PredictionCache.key(text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+
+        # score each distinct uncached text once
+        missing = {}
+        for i, result in enumerate(results):
+            if result is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            scored = dict(zip(missing, self._score(list(missing.values()))))
+            for key, result in scored.items():
+                self.cache.put(key, result)
+            results = [result if result is not None else scored[key] for result, key in zip(results, keys)]
+        return results
+
+
+def load_scorer(**kwargs):
+    """build and warm up the scorer, logging where the startup time went"""
+    scorer = SpamScorer(**kwargs)
+    scorer.warm_up()
+    STARTUP_TIMINGS.update(scorer.timings)
+    STARTUP_TIMINGS["total"] = time.perf_counter() - _import_start
+    breakdown = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in STARTUP_TIMINGS.items())
+    logger.info(f"Scorer ready: {breakdown}")
+    return scorer
@@ -0,0 +1,20 @@
+# Smoke check run while building the image: importing the app loads and warms
+# up the scorer, then one message is scored through /predict. The build fails
+# if the model and the text artifacts do not go together.
+import sys
+from app import app
+
+MESSAGE = "WINNER!! You have been selected to receive a free prize, call now to claim"
+
+def main():
+    client = app.test_client()
+    response = client.post("/predict", json={"message": MESSAGE})
+    prediction = (response.get_json() or {}).get("prediction")
+    if response.status_code != 200 or not prediction:
+        print(f"/predict answered {response.status_code}: {response.get_data(as_text=True)}")
+        return 1
+    print(f"smoke test passed: {prediction}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
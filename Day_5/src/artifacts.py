@@ -0,0 +1,187 @@
+import os
+import io
+import copy
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+import joblib
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("artifacts")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "artifacts.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+
+# attributes that differ between processes for the same fitted object, e.g.
+# the id() of stop_words a fitted TfidfVectorizer keeps; they are left out of
+# the saved file so identical content always hashes the same
+VOLATILE_ATTRIBUTES = ('_stop_words_id',)
+
+# sha256 -> loaded object, so every consumer in the process shares one copy
+_loaded = {}
+
+def _write_atomic(path, data):
+    """write bytes to a temp file and rename it over path"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _dump(obj):
+    """joblib bytes of obj without its volatile attributes"""
+    state = getattr(obj, '__dict__', {})
+    if any(attribute in state for attribute in VOLATILE_ATTRIBUTES):
+        obj = copy.copy(obj)
+        for attribute in VOLATILE_ATTRIBUTES:
+            obj.__dict__.pop(attribute, None)
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getvalue()
+
+def _manifest_path(name, artifact_dir):
+    return os.path.join(artifact_dir, f"{name}.json")
+
+def read_manifest(name, artifact_dir=ARTIFACT_DIR):
+    """version history of an artifact, or None if it was never saved"""
+    path = _manifest_path(name, artifact_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def artifact_file(name, artifact_dir=ARTIFACT_DIR):
+    """
+    Latest version file of an artifact. Unlike the manifest, which later
+    saves append to, it never changes once written.
+    """
+    manifest = read_manifest(name, artifact_dir)
+    return os.path.join(artifact_dir, manifest['versions'][-1]['file'])
+
+def select_artifact_file(name, paths):
+    """
+    Make the version of an artifact stored in one of paths (e.g. stage outputs
+    restored by the stage cache) its latest version again. The manifest is
+    only appended to: the entry of that file is added as a new version unless
+    it already is the latest one. Returns the entry, or None if no path is a
+    version file of the artifact.
+    """
+    files = [path for path in paths
+             if os.path.basename(path).startswith(f"{name}-v") and path.endswith('.joblib')]
+    if not files:
+        return None
+    artifact_dir, file_name = os.path.split(files[0])
+    try:
+        manifest = read_manifest(name, artifact_dir) or {'name': name, 'versions': []}
+        versions = manifest['versions']
+        if versions and versions[-1]['file'] == file_name:
+            return versions[-1]
+        known = [entry for entry in versions if entry['file'] == file_name]
+        if known:
+            entry = dict(known[-1])
+        else:
+            # the manifest lost track of the file, describe it again
+            with open(files[0], 'rb') as f:
+                data = f.read()
+            obj = joblib.load(io.BytesIO(data))
+            entry = {
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'file': file_name,
+                'type': f"{type(obj).__module__}.{type(obj).__qualname__}",
+                'size': len(data),
+            }
+        entry['version'] = len(versions) + 1
+        entry['created'] = datetime.now(timezone.utc).isoformat()
+        versions.append(entry)
+        os.makedirs(artifact_dir, exist_ok=True)
+        _write_atomic(_manifest_path(name, artifact_dir), json.dumps(manifest, indent=2).encode())
+        logger.debug(f"Artifact {name} set back to {file_name} as v{entry['version']}")
+        return entry
+    except Exception as e:
+        logger.error(f"Failed to select {file_name} for artifact {name}: {e}")
+        raise
+
+def save_artifact(obj, name, artifact_dir=ARTIFACT_DIR):
+    """
+    Serialize obj with joblib as artifacts/<name>-v<version>-<hash>.joblib and
+    record it in artifacts/<name>.json. Saving identical content again keeps
+    the current version instead of creating a new one.
+    Returns the manifest entry of the saved version.
+    """
+    try:
+        os.makedirs(artifact_dir, exist_ok=True)
+        data = _dump(obj)
+        digest = hashlib.sha256(data).hexdigest()
+
+        manifest = read_manifest(name, artifact_dir) or {'name': name, 'versions': []}
+        if manifest['versions'] and manifest['versions'][-1]['sha256'] == digest:
+            logger.debug(f"Artifact {name} unchanged (v{manifest['versions'][-1]['version']})")
+            return manifest['versions'][-1]
+
+        version = len(manifest['versions']) + 1
+        entry = {
+            'version': version,
+            'sha256': digest,
+            'file': f"{name}-v{version}-{digest[:12]}.joblib",
+            'type': f"{type(obj).__module__}.{type(obj).__qualname__}",
+            'size': len(data),
+            'created': datetime.now(timezone.utc).isoformat(),
+        }
+        _write_atomic(os.path.join(artifact_dir, entry['file']), data)
+        manifest['versions'].append(entry)
+        _write_atomic(_manifest_path(name, artifact_dir), json.dumps(manifest, indent=2).encode())
+        logger.debug(f"Artifact {name} saved as v{version} ({digest[:12]})")
+        return entry
+    except Exception as e:
+        logger.error(f"Failed to save artifact {name}: {e}")
+        raise
+
+def load_artifact(name, artifact_dir=ARTIFACT_DIR, version=None):
+    """
+    Load the latest (or the given) version of an artifact. The file is read
+    and its sha256 checked only the first time, later calls return the
+    object cached in-process.
+    """
+    try:
+        manifest = read_manifest(name, artifact_dir)
+        if not manifest or not manifest['versions']:
+            raise FileNotFoundError(f"no artifact named {name} in {artifact_dir}")
+        if version is None:
+            entry = manifest['versions'][-1]
+        else:
+            matches = [v for v in manifest['versions'] if v['version'] == version]
+            if not matches:
+                raise ValueError(f"artifact {name} has no version {version}")
+            entry = matches[0]
+
+        if entry['sha256'] in _loaded:
+            return _loaded[entry['sha256']]
+
+        with open(os.path.join(artifact_dir, entry['file']), 'rb') as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise ValueError(f"artifact {entry['file']} does not match its recorded sha256")
+        obj = joblib.load(io.BytesIO(data))
+        _loaded[entry['sha256']] = obj
+        logger.debug(f"Artifact {name} v{entry['version']} loaded ({entry['sha256'][:12]})")
+        return obj
+    except Exception as e:
+        logger.error(f"Failed to load artifact {name}: {e}")
+        raise
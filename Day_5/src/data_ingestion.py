@@ -1,7 +1,10 @@
 import pandas as pd
+import numpy as np
 import os
+import argparse
 from sklearn.model_selection import train_test_split
 import logging
+from stage_cache import run_stage
 
 log_dir = "logs"
 os.makedirs(log_dir, exist_ok=True)
@@ -68,18 +71,95 @@ def save_data(df: pd.DataFrame, save_dir: str) -> None:
         logger.error(f"Failed to save data: {e}")
         raise
 
-def main():
-    """main function"""
+def stream_data(data_url: str, save_dir: str, chunksize: int = 100_000,
+                test_size: float = 0.2, random_state: int = 42) -> None:
+    """
+    Streaming version of load_data -> preprocess_data -> save_data.
+    Reads the csv in chunks, drops NA rows, drops duplicates across chunks
+    using a set of 64-bit row hashes and routes every row to train or test
+    from a seeded hash of its content, appending to both files as it goes.
+    Memory is bounded by one chunk plus one hash per unique row.
+    The split is deterministic for a given random_state but is not the same
+    split train_test_split produces.
+    """
     try:
-        data_url = "https://raw.githubusercontent.com/bigmlcom/python/refs/heads/master/data/spam.csv"
+        save_dir = os.path.join(save_dir, "raw_data")
+        os.makedirs(save_dir, exist_ok=True)
+        train_path = os.path.join(save_dir, "train_data.csv")
+        test_path = os.path.join(save_dir, "test_data.csv")
+        for path in (train_path, test_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        split_key = str(random_state).zfill(16)[:16]
+        seen = set()
+        n_read = n_train = n_test = 0
+        for chunk in pd.read_csv(data_url, sep='\t', chunksize=chunksize):
+            n_read += len(chunk)
+            chunk = chunk.dropna()
+
+            row_hashes = pd.util.hash_pandas_object(chunk, index=False).tolist()
+            keep = np.zeros(len(chunk), dtype=bool)
+            for i, row_hash in enumerate(row_hashes):
+                if row_hash not in seen:
+                    seen.add(row_hash)
+                    keep[i] = True
+            chunk = chunk[keep]
+
+            split_hash = pd.util.hash_pandas_object(chunk, index=False, hash_key=split_key).to_numpy()
+            is_test = (split_hash >> np.uint64(11)) * 2.0 ** -53 < test_size
+            train_chunk, test_chunk = chunk[~is_test], chunk[is_test]
+            train_chunk.to_csv(train_path, mode='a', header=n_train == 0 and len(train_chunk) > 0, index=False)
+            test_chunk.to_csv(test_path, mode='a', header=n_test == 0 and len(test_chunk) > 0, index=False)
+            n_train += len(train_chunk)
+            n_test += len(test_chunk)
+            logger.debug(f"Streamed {n_read} rows: {n_train} train, {n_test} test")
+        logger.debug(f"Data streamed from {data_url} and saved to {save_dir} "
+                     f"({n_read - n_train - n_test} NA/duplicate rows dropped)")
+    except Exception as e:
+        logger.error(f"Failed to stream data from {data_url}: {e}")
+        raise
+
+def ingest(data_url: str, save_dir: str, stream: bool = False, chunksize: int = 100_000) -> None:
+    """load, clean and split the data, in memory or streamed in chunks"""
+    if stream:
+        stream_data(data_url, save_dir, chunksize=chunksize)
+    else:
         df = load_data(data_url)
         df = preprocess_data(df)
-        save_data(df, 'data')  # Save train and test splits
+        save_data(df, save_dir)  # Save train and test splits
+
+def main(stream: bool = False, chunksize: int = 100_000, use_cache: bool = True):
+    """main function"""
+    try:
+        data_url = "https://raw.githubusercontent.com/bigmlcom/python/refs/heads/master/data/spam.csv"
+        save_dir = os.path.abspath('data')
+        if use_cache:
+            # the remote csv is fingerprinted by its ETag / Last-Modified headers
+            run_stage(
+                'data_ingestion',
+                lambda: ingest(data_url, save_dir, stream, chunksize),
+                inputs=[data_url],
+                outputs=[os.path.join(save_dir, 'raw_data', 'train_data.csv'),
+                         os.path.join(save_dir, 'raw_data', 'test_data.csv')],
+                params={'stream': stream, 'chunksize': chunksize, 'test_size': 0.2, 'random_state': 42},
+                code_files=[__file__],
+            )
+        else:
+            ingest(data_url, save_dir, stream, chunksize)
         logger.info("Data ingestion completed successfully")
     except Exception as e:
         logger.error(f"Error in main function: {e}")
         raise
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download the dataset and save train/test splits")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the csv in chunks instead of loading it all in memory")
+    parser.add_argument("--chunksize", type=int, default=100_000,
+                        help="rows per chunk in --stream mode")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always rerun the stage, even if its inputs did not change")
+    args = parser.parse_args()
+    main(stream=args.stream, chunksize=args.chunksize, use_cache=not args.no_cache)
 
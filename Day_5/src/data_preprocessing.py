@@ -1,11 +1,13 @@
 import pandas as pd
 import os
 import logging
-from nltk.stem.porter import PorterStemmer
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import nltk
-import string
-from nltk.corpus import stopwords
 from sklearn.preprocessing import LabelEncoder
+from artifacts import save_artifact, artifact_file, select_artifact_file
+from stage_cache import run_stage
+from text_normalizer import normalize_texts, transform_text, load_resources, stem_cache_info
 
 log_dir = "logs"
 os.makedirs(log_dir, exist_ok=True)
@@ -28,50 +30,107 @@ if not logger.hasHandlers():
     logger.addHandler(console_handler)
     logger.addHandler(file_handler)
 
-def transform_text(text):
-    """transform text to lowercase and remove special characters"""
-    ps = PorterStemmer()
-    text = text.lower()
-    text = nltk.word_tokenize(text)
-    text = [word for word in text if word.isalnum()]
-    text = [word for word in text if word not in stopwords.words('english') and word not in string.punctuation]
-    text = [ps.stem(word) for word in text]
-    text = " ".join(text)
-    return text
-
-def preprocess_data(df, text_column = 'Message', label_column = 'Type'):
+# rows per shard handed to a worker in --workers mode
+SHARD_SIZE = 5_000
+
+def _init_worker():
+    """load the NLTK resources once per worker process instead of per row"""
+    load_resources()
+
+def normalize_texts_sharded(texts, pool, shard_size=SHARD_SIZE):
+    """
+    Split texts into shards, normalize them on a process pool and
+    reassemble the results in the original order.
+    """
+    texts = list(texts)
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+    normalized = []
+    for shard in pool.map(normalize_texts, shards):
+        normalized.extend(shard)
+    return normalized
+
+def preprocess_data(df, text_column = 'Message', label_column = 'Type', pool = None, encoder = None):
+    """
+    Encode the label column, drop duplicates and normalize the text column.
+    An encoder that is already fitted (e.g. on the train split) is reused as is.
+    """
     try:
-        encoder = LabelEncoder()
-        df[label_column] = encoder.fit_transform(df[label_column])
+        if encoder is None:
+            encoder = LabelEncoder()
+        if hasattr(encoder, 'classes_'):
+            df[label_column] = encoder.transform(df[label_column])
+        else:
+            df[label_column] = encoder.fit_transform(df[label_column])
         logger.debug(f"target column encoded successfully")
         df.drop_duplicates(inplace=True)
         logger.debug(f"duplicates dropped successfully")
 
-        df.loc[:,text_column] = df[text_column].apply(transform_text)
+        if pool is None:
+            df.loc[:,text_column] = normalize_texts(df[text_column])
+        else:
+            df.loc[:,text_column] = normalize_texts_sharded(df[text_column], pool)
         logger.debug(f"text column transformed successfully")
         return df   
     except Exception as e:
         logger.error(f"Failed to preprocess data: {e}")
         raise
 
-def main(text_column = 'Message', label_column = 'Type'):
+def preprocess_splits(raw_dir, data_path, text_column = 'Message', label_column = 'Type', workers = 1):
+    """preprocess the raw train/test csv files and save them to data_path"""
+    train_df = pd.read_csv(os.path.join(raw_dir, 'train_data.csv'))
+    test_df = pd.read_csv(os.path.join(raw_dir, 'test_data.csv'))
+    encoder = LabelEncoder()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            train_df = preprocess_data(train_df, text_column, label_column, pool, encoder)
+            test_df = preprocess_data(test_df, text_column, label_column, pool, encoder)
+        logger.debug(f"text normalized on {workers} worker processes")
+    else:
+        train_df = preprocess_data(train_df, text_column, label_column, encoder=encoder)
+        test_df = preprocess_data(test_df, text_column, label_column, encoder=encoder)
+        cache = stem_cache_info()
+        logger.debug(f"stem cache: {cache.hits} hits, {cache.misses} misses, {cache.currsize}/{cache.maxsize} entries")
+    os.makedirs(data_path, exist_ok=True)
+    train_df.to_csv(os.path.join(data_path, "train.csv"), index=False)
+    test_df.to_csv(os.path.join(data_path, "test.csv"), index=False)
+    save_artifact(encoder, 'label_encoder')
+
+def main(text_column = 'Message', label_column = 'Type', workers = 1, use_cache = True):
     """main function"""
     try:
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        train_df = pd.read_csv(os.path.join(base_dir, 'data', 'raw_data', 'train_data.csv'))
-        test_df = pd.read_csv(os.path.join(base_dir, 'data', 'raw_data', 'test_data.csv'))
-        train_df = preprocess_data(train_df, text_column, label_column)
-        test_df = preprocess_data(test_df, text_column, label_column)
+        raw_dir = os.path.join(base_dir, 'data', 'raw_data')
         data_path = os.path.join(base_dir, 'data', 'processed')
-        os.makedirs(data_path, exist_ok=True)
-        train_df.to_csv(os.path.join(data_path, "train.csv"), index=False)
-        test_df.to_csv(os.path.join(data_path, "test.csv"), index=False)
+        if use_cache:
+            # workers is left out of the params, sharding does not change the output
+            run_stage(
+                'data_preprocessing',
+                lambda: preprocess_splits(raw_dir, data_path, text_column, label_column, workers),
+                inputs=[os.path.join(raw_dir, 'train_data.csv'), os.path.join(raw_dir, 'test_data.csv')],
+                outputs=lambda: [os.path.join(data_path, 'train.csv'), os.path.join(data_path, 'test.csv')]
+                                + [artifact_file('label_encoder')],
+                params={'text_column': text_column, 'label_column': label_column},
+                # the normalization and the artifact format live in their own modules
+                code_files=[__file__, os.path.join(base_dir, 'text_normalizer.py'),
+                            os.path.join(base_dir, 'artifacts.py')],
+                # the restored encoder becomes the latest version again
+                on_hit=lambda outs: select_artifact_file('label_encoder', outs),
+            )
+        else:
+            preprocess_splits(raw_dir, data_path, text_column, label_column, workers)
         logger.info(f"Data preprocessed and saved to {data_path}")
     except Exception as e:
         logger.error(f"Failed to preprocess data: {e}")
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess the raw train/test splits")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes used to normalize text")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always rerun the stage, even if its inputs did not change")
+    args = parser.parse_args()
+
     # Ensure NLTK resources are downloaded
     try:
         nltk.data.find('tokenizers/punkt')
@@ -81,6 +140,6 @@ if __name__ == "__main__":
         nltk.data.find('corpora/stopwords')
     except LookupError:
         nltk.download('stopwords')
-    main()
+    main(workers=args.workers, use_cache=not args.no_cache)
 
 
@@ -1,7 +1,15 @@
 import os
+import json
 import logging
-from sklearn.feature_extraction.text import TfidfVectorizer
+import struct
+import zipfile
+import argparse
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 import pandas as pd
+import scipy.sparse as sp
+from artifacts import save_artifact, artifact_file, select_artifact_file
+from stage_cache import run_stage
 
 # Set up logger
 log_dir = "logs"
@@ -41,42 +49,254 @@ def tfidf_vectorizer(df, text_column='Message', max_features=500):
         logger.error(f"Failed to fit vectorizer: {e}")
         raise
 
-def transform_and_save(df, vectorizer, text_column, output_path):
+class IncrementalTfidf:
     """
-    Transform the text column using the provided vectorizer and save as CSV.
+    TF-IDF fitting state that can be updated one batch of documents at a time.
+    Keeps the document count and, per term, its document frequency and total
+    count, which is all TfidfVectorizer(max_features=...) needs to pick its
+    vocabulary and idf weights. to_vectorizer() returns the same vectorizer a
+    full refit on every batch seen so far would give, without the old text.
+    """
+
+    def __init__(self, max_features=500):
+        self.max_features = max_features
+        self.n_docs = 0
+        self.doc_freq = {}
+        self.term_freq = {}
+
+    def partial_fit(self, texts):
+        """add a batch of documents to the state"""
+        texts = list(texts)
+        self.n_docs += len(texts)
+        counter = CountVectorizer()
+        try:
+            counts = counter.fit_transform(texts)
+        except ValueError:
+            # the batch has no tokens at all, only the document count changes
+            return self
+        terms = counter.get_feature_names_out()
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        term_freq = np.asarray(counts.sum(axis=0)).ravel()
+        for term, df, tf in zip(terms, doc_freq.tolist(), term_freq.tolist()):
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + df
+            self.term_freq[term] = self.term_freq.get(term, 0) + tf
+        return self
+
+    def to_vectorizer(self):
+        """build a fitted TfidfVectorizer from the current state"""
+        terms = sorted(self.term_freq)
+        if self.max_features is not None and len(terms) > self.max_features:
+            # most frequent terms across the corpus, selected over the
+            # alphabetical order exactly like CountVectorizer._limit_features
+            term_freq = np.array([self.term_freq[term] for term in terms])
+            keep = np.sort((-term_freq).argsort()[:self.max_features])
+            terms = [terms[i] for i in keep]
+        doc_freq = np.array([self.doc_freq[term] for term in terms], dtype=np.float64)
+        vectorizer = TfidfVectorizer(max_features=self.max_features, vocabulary=terms)
+        vectorizer.idf_ = np.log((self.n_docs + 1) / (doc_freq + 1)) + 1
+        return vectorizer
+
+    def save(self, path):
+        """persist the state as json"""
+        with open(path, 'w') as f:
+            json.dump({'max_features': self.max_features, 'n_docs': self.n_docs,
+                       'doc_freq': self.doc_freq, 'term_freq': self.term_freq}, f)
+
+    @classmethod
+    def load(cls, path):
+        """load a state written by save"""
+        with open(path) as f:
+            state = json.load(f)
+        tfidf = cls(state['max_features'])
+        tfidf.n_docs = state['n_docs']
+        tfidf.doc_freq = state['doc_freq']
+        tfidf.term_freq = state['term_freq']
+        return tfidf
+
+def incremental_tfidf_vectorizer(df, state_path, text_column='Message', max_features=500):
+    """
+    Update the persisted IncrementalTfidf state at state_path with the new
+    documents in df (creating it if needed) and return the resulting vectorizer.
+    """
+    try:
+        df = df.dropna(subset=[text_column])
+        if os.path.exists(state_path):
+            tfidf = IncrementalTfidf.load(state_path)
+        else:
+            tfidf = IncrementalTfidf(max_features)
+        tfidf.partial_fit(df[text_column])
+        tfidf.save(state_path)
+        logger.debug(f"TF-IDF state updated with {len(df)} documents ({tfidf.n_docs} in total)")
+        return tfidf.to_vectorizer()
+    except Exception as e:
+        logger.error(f"Failed to update TF-IDF state: {e}")
+        raise
+
+def vocabulary_path(features_path):
+    """path of the vocabulary sidecar written next to a feature file"""
+    return os.path.splitext(features_path)[0] + '_vocab.json'
+
+def save_features(X, feature_names, output_path, compressed=False):
+    """
+    Save a sparse feature matrix in CSR form as .npz (data, indices, indptr,
+    shape) and its column names as a json vocabulary sidecar. A dense array
+    is saved as .npy instead, with the extension of output_path replaced.
+    Files are stored uncompressed by default so load_features(..., mmap=True)
+    can map them without copying.
+    Returns the path the matrix was written to.
+    """
+    try:
+        if sp.issparse(X):
+            sp.save_npz(output_path, X.tocsr(), compressed=compressed)
+        else:
+            output_path = os.path.splitext(output_path)[0] + '.npy'
+            np.save(output_path, np.asarray(X))
+        with open(vocabulary_path(output_path), 'w') as f:
+            json.dump([str(name) for name in feature_names], f)
+        logger.debug(f"Features saved to {output_path}")
+        return output_path
+    except Exception as e:
+        logger.error(f"Failed to save features to {output_path}: {e}")
+        raise
+
+def _mmap_npz(path):
+    """
+    Memory-map every array stored in an uncompressed .npz read-only.
+    Returns None if any member is compressed and has to be inflated instead.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            # skip the local file header to reach the .npy payload
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')]
+            if dtype.hasobject:
+                return None
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                                     shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+def load_features(path, mmap=False):
+    """
+    Load a feature file written by save_features.
+    Returns the matrix (CSR, or ndarray for .npy) and the list of feature names.
+    With mmap the arrays are memory-mapped read-only, so processes on the same
+    host share the page cache and opening the file costs almost nothing.
+    """
+    try:
+        if path.endswith('.npy'):
+            X = np.load(path, mmap_mode='r' if mmap else None)
+        elif mmap and (arrays := _mmap_npz(path)) is not None:
+            X = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                              shape=tuple(int(n) for n in arrays['shape']))
+        else:
+            if mmap:
+                logger.warning(f"{path} is compressed and cannot be memory-mapped, loading it in memory")
+            X = sp.load_npz(path).tocsr()
+        with open(vocabulary_path(path)) as f:
+            feature_names = json.load(f)
+        logger.debug(f"Features loaded from {path}")
+        return X, feature_names
+    except Exception as e:
+        logger.error(f"Failed to load features from {path}: {e}")
+        raise
+
+def transform_and_save(df, vectorizer, text_column, output_path, export_csv=False):
+    """
+    Transform the text column using the provided vectorizer and save it as a
+    sparse .npz feature file. With export_csv the dense matrix is also written
+    to a .csv of the same name.
     """
     try:
         # Drop rows with missing text
         df = df.dropna(subset=[text_column])
         X = vectorizer.transform(df[text_column])
         feature_names = vectorizer.get_feature_names_out()
-        X_df = pd.DataFrame(X.toarray(), columns=feature_names)
-        X_df.to_csv(output_path, index=False)
+        save_features(X, feature_names, output_path)
+        if export_csv:
+            csv_path = os.path.splitext(output_path)[0] + '.csv'
+            X_df = pd.DataFrame(X.toarray(), columns=feature_names)
+            X_df.to_csv(csv_path, index=False)
+            logger.debug(f"Dense CSV exported to {csv_path}")
         logger.info(f"Transformed data saved to {output_path}")
     except Exception as e:
         logger.error(f"Failed to transform or save data: {e}")
         raise
 
-def main(text_column='Message', train_file='train.csv', test_file='test.csv'):
+def build_features(data_dir, text_column='Message', train_file='train.csv', test_file='test.csv',
+                   export_csv=False, state_file=None):
+    """fit (or update) the vectorizer and write the train/test feature files"""
+    train_df = pd.read_csv(os.path.join(data_dir, train_file))
+    test_df = pd.read_csv(os.path.join(data_dir, test_file))
+    if state_file:
+        state_path = os.path.join(data_dir, state_file)
+        vectorizer = incremental_tfidf_vectorizer(train_df, state_path, text_column)
+    else:
+        vectorizer = tfidf_vectorizer(train_df, text_column)
+    logger.info("Vectorizer fitted successfully.")
+    # Transform and save
+    transform_and_save(train_df, vectorizer, text_column, os.path.join(data_dir, 'train_tfidf.npz'), export_csv)
+    transform_and_save(test_df, vectorizer, text_column, os.path.join(data_dir, 'test_tfidf.npz'), export_csv)
+    save_artifact(vectorizer, 'tfidf_vectorizer')
+
+def feature_outputs(data_dir, export_csv=False):
+    """files written by build_features"""
+    outputs = []
+    for split in ('train', 'test'):
+        features_path = os.path.join(data_dir, f'{split}_tfidf.npz')
+        outputs += [features_path, vocabulary_path(features_path)]
+        if export_csv:
+            outputs.append(os.path.join(data_dir, f'{split}_tfidf.csv'))
+    return outputs + [artifact_file('tfidf_vectorizer')]
+
+def main(text_column='Message', train_file='train.csv', test_file='test.csv', export_csv=False,
+         state_file=None, use_cache=True):
     """
     Main function to perform TF-IDF feature engineering on train and test data.
+    With state_file, train_file holds only the new batch of documents and the
+    vectorizer is derived from the persisted TF-IDF state instead of a refit.
     """
     try:
         base_dir = os.path.dirname(os.path.abspath(__file__))
         data_dir = os.path.join(base_dir, 'data', 'processed')
-        train_path = os.path.join(data_dir, train_file)
-        test_path = os.path.join(data_dir, test_file)
-        train_df = pd.read_csv(train_path)
-        test_df = pd.read_csv(test_path)
-        vectorizer = tfidf_vectorizer(train_df, text_column)
-        logger.info("Vectorizer fitted successfully.")
-        # Transform and save
-        transform_and_save(train_df, vectorizer, text_column, os.path.join(data_dir, 'train_tfidf.csv'))
-        transform_and_save(test_df, vectorizer, text_column, os.path.join(data_dir, 'test_tfidf.csv'))
+        # an incremental update changes its own state file, it is never cached
+        if use_cache and not state_file:
+            run_stage(
+                'feature_engineering',
+                lambda: build_features(data_dir, text_column, train_file, test_file, export_csv),
+                inputs=[os.path.join(data_dir, train_file), os.path.join(data_dir, test_file)],
+                outputs=lambda: feature_outputs(data_dir, export_csv),
+                params={'text_column': text_column, 'max_features': 500, 'export_csv': export_csv},
+                code_files=[__file__, os.path.join(base_dir, 'artifacts.py')],
+                # the restored vectorizer becomes the latest version again
+                on_hit=lambda outs: select_artifact_file('tfidf_vectorizer', outs),
+            )
+        else:
+            build_features(data_dir, text_column, train_file, test_file, export_csv, state_file)
         logger.info("Feature engineering completed successfully.")
     except Exception as e:
         logger.error(f"Feature engineering failed: {e}")
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="TF-IDF feature engineering on the processed splits")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="also write the dense train_tfidf.csv / test_tfidf.csv")
+    parser.add_argument("--state", default=None,
+                        help="incremental mode: TF-IDF state file (under data/processed) updated with train_file")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always rerun the stage, even if its inputs did not change")
+    args = parser.parse_args()
+    main(export_csv=args.export_csv, state_file=args.state, use_cache=not args.no_cache)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import os
+import csv
+import logging
+import argparse
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from artifacts import ARTIFACT_DIR, load_artifact
+from text_normalizer import normalize_texts
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("flat_forest")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "flat_forest.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous arrays: every
+    tree's nodes are concatenated, children are global node indices and
+    leaves point at themselves, so a batch walks all trees at once with one
+    vectorized step per tree level. Exposes classes_, n_features_in_ and
+    predict_proba/predict like the sklearn model.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, n_features_in):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features_in)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """flatten a fitted single-output RandomForestClassifier"""
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("only single-output forests can be flattened")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset)
+            # class fractions per node, like DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.concatenate(values), np.array(roots, dtype=np.int32),
+            max_depth, np.asarray(model.classes_), model.n_features_in_,
+        )
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots,
+                 max_depth=self.max_depth, classes=self.classes_, n_features_in=self.n_features_in_)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+        return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+                   arrays['value'], arrays['roots'], arrays['max_depth'], arrays['classes'],
+                   arrays['n_features_in'])
+
+    def apply(self, X):
+        """leaf index reached in every tree, shape (n_samples, n_trees)"""
+        # trees compare float32 features against float64 thresholds
+        X = X.toarray() if sp.issparse(X) else np.asarray(X)
+        X = X.astype(np.float32)
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        nodes = np.tile(self.roots, n_samples)
+        samples = np.repeat(np.arange(n_samples), n_trees)
+        # step only the (sample, tree) pairs that have not reached a leaf yet
+        active = np.flatnonzero(self.left[nodes] != nodes)
+        while active.size:
+            current = nodes[active]
+            go_left = X[samples[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[nodes[active]] != nodes[active]]
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        # accumulate tree by tree, in the same order as the sklearn forest
+        for t in range(leaves.shape[1]):
+            proba += self.value[leaves[:, t]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def check_parity(model, forest, X):
+    """raise if the flat forest does not reproduce the sklearn probabilities on X"""
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    if not np.allclose(expected, actual, rtol=0, atol=1e-12):
+        raise ValueError(f"flat forest differs from sklearn by up to {np.abs(expected - actual).max()}")
+    if not np.array_equal(model.predict(X), forest.predict(X)):
+        raise ValueError("flat forest predicts different labels than sklearn")
+    logger.debug(f"Flat forest matches sklearn on {X.shape[0]} samples")
+
+def tfidf_rows(data_path, artifact_dir=ARTIFACT_DIR, text_column='Message'):
+    """
+    The messages of a tab-separated csv as the service sees them: normalized
+    and transformed by the tfidf_vectorizer artifact.
+    """
+    with open(data_path, newline='', encoding='utf-8') as f:
+        messages = [row[text_column] for row in csv.DictReader(f, delimiter='\t') if row[text_column]]
+    return load_artifact('tfidf_vectorizer', artifact_dir).transform(normalize_texts(messages))
+
+def export_forest(model_path, output_path, X_check=None, n_check=1000):
+    """
+    Flatten the forest saved at model_path into output_path (.npz), after
+    checking it against sklearn on X_check, or on random sparse rows if none.
+    Random rows rarely reach the deep nodes, pass real TF-IDF rows
+    (tfidf_rows) where they are available.
+    """
+    try:
+        model = joblib.load(model_path)
+        forest = FlatForest.from_sklearn(model)
+        if X_check is None:
+            X_check = sp.random(n_check, model.n_features_in_, density=0.02, format='csr', random_state=42)
+        check_parity(model, forest, X_check)
+        forest.save(output_path)
+        logger.info(f"Flat forest with {len(forest.roots)} trees and {len(forest.feature)} nodes saved to {output_path}")
+        return forest
+    except Exception as e:
+        logger.error(f"Failed to export forest from {model_path}: {e}")
+        raise
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Flatten the random forest for fast scoring")
+    parser.add_argument("--model", default=os.path.join(base_dir, '..', 'spam_model_rf.joblib'))
+    parser.add_argument("--output", default=os.path.join(base_dir, '..', 'spam_model_rf_flat.npz'))
+    parser.add_argument("--check-data", default=None,
+                        help="tab-separated csv of messages to check the export on, "
+                             "transformed with the tfidf_vectorizer artifact")
+    parser.add_argument("--artifact-dir", default=ARTIFACT_DIR)
+    args = parser.parse_args()
+    X_check = tfidf_rows(args.check_data, args.artifact_dir) if args.check_data else None
+    export_forest(args.model, args.output, X_check)
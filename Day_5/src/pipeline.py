@@ -0,0 +1,126 @@
+import os
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import nltk
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+import data_ingestion
+import data_preprocessing
+import feature_engineering
+from artifacts import save_artifact
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("pipeline")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "pipeline.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+DATA_URL = "https://raw.githubusercontent.com/bigmlcom/python/refs/heads/master/data/spam.csv"
+
+def run_pipeline(data_url=DATA_URL, data_dir='data', text_column='Message', label_column='Type',
+                 max_features=500, workers=1, checkpoints=(), export_csv=False):
+    """
+    Run ingestion -> preprocessing -> feature engineering in one process,
+    passing DataFrames and matrices from stage to stage in memory. Only the
+    feature files and artifacts are written at the end, plus the intermediate
+    csv files of the stages named in checkpoints ('raw', 'processed').
+    Returns the train/test feature matrices and label arrays.
+    """
+    try:
+        df = data_ingestion.load_data(data_url)
+        df = data_ingestion.preprocess_data(df)
+        train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+        logger.debug(f"Ingested {len(df)} rows")
+        if 'raw' in checkpoints:
+            raw_dir = os.path.join(data_dir, 'raw_data')
+            os.makedirs(raw_dir, exist_ok=True)
+            train_df.to_csv(os.path.join(raw_dir, 'train_data.csv'), index=False)
+            test_df.to_csv(os.path.join(raw_dir, 'test_data.csv'), index=False)
+            logger.debug(f"Raw checkpoint saved to {raw_dir}")
+
+        encoder = LabelEncoder()
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=data_preprocessing._init_worker) as pool:
+                train_df = data_preprocessing.preprocess_data(train_df, text_column, label_column, pool, encoder)
+                test_df = data_preprocessing.preprocess_data(test_df, text_column, label_column, pool, encoder)
+        else:
+            train_df = data_preprocessing.preprocess_data(train_df, text_column, label_column, encoder=encoder)
+            test_df = data_preprocessing.preprocess_data(test_df, text_column, label_column, encoder=encoder)
+        processed_dir = os.path.join(data_dir, 'processed')
+        os.makedirs(processed_dir, exist_ok=True)
+        if 'processed' in checkpoints:
+            train_df.to_csv(os.path.join(processed_dir, 'train.csv'), index=False)
+            test_df.to_csv(os.path.join(processed_dir, 'test.csv'), index=False)
+            logger.debug(f"Processed checkpoint saved to {processed_dir}")
+
+        # texts left empty by normalization come back as NaN from train.csv and
+        # are dropped by the feature stage, drop them here too so both agree
+        train_df = train_df[train_df[text_column] != '']
+        test_df = test_df[test_df[text_column] != '']
+
+        vectorizer = feature_engineering.tfidf_vectorizer(train_df, text_column, max_features)
+        feature_names = vectorizer.get_feature_names_out()
+        X_train = vectorizer.transform(train_df[text_column])
+        X_test = vectorizer.transform(test_df[text_column])
+
+        for split, X in (('train', X_train), ('test', X_test)):
+            features_path = os.path.join(processed_dir, f'{split}_tfidf.npz')
+            feature_engineering.save_features(X, feature_names, features_path)
+            if export_csv:
+                pd.DataFrame(X.toarray(), columns=feature_names).to_csv(
+                    os.path.join(processed_dir, f'{split}_tfidf.csv'), index=False)
+        save_artifact(encoder, 'label_encoder')
+        save_artifact(vectorizer, 'tfidf_vectorizer')
+        logger.info(f"Pipeline completed, features saved to {processed_dir}")
+        return X_train, X_test, train_df[label_column].to_numpy(), test_df[label_column].to_numpy()
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}")
+        raise
+
+def main(workers=1, checkpoints=(), export_csv=False):
+    """main function"""
+    try:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        run_pipeline(data_dir=os.path.join(base_dir, 'data'), workers=workers,
+                     checkpoints=checkpoints, export_csv=export_csv)
+    except Exception as e:
+        logger.error(f"Error in main function: {e}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Day_5 pipeline in a single process")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes used to normalize text")
+    parser.add_argument("--checkpoint", action="append", default=[], choices=['raw', 'processed'],
+                        help="also write the csv files of this stage (can be repeated)")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="also write the dense train_tfidf.csv / test_tfidf.csv")
+    args = parser.parse_args()
+
+    # Ensure NLTK resources are downloaded
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords')
+    main(workers=args.workers, checkpoints=args.checkpoint, export_csv=args.export_csv)
@@ -0,0 +1,142 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+log_dir = "logs"
+os.makedirs(log_dir, exist_ok=True)
+
+logger = logging.getLogger("stage_cache")
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+
+    log_file = os.path.join(log_dir, "stage_cache.log")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+# lock files live in the cache root, output copies under files/md5/<2>/<30>
+# like the dvc cache in Day_4
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.stage_cache')
+
+def file_md5(path, block_size=1 << 20):
+    """md5 of a file, read in blocks"""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def url_fingerprint(url, timeout=10):
+    """
+    ETag, Last-Modified and Content-Length of a remote input, from a HEAD
+    request. None if the server sends neither ETag nor Last-Modified, or
+    cannot be reached: a change of the content could then go unnoticed.
+    """
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method='HEAD'), timeout=timeout) as response:
+            headers = response.headers
+    except (urllib.error.URLError, OSError) as e:
+        logger.warning(f"Could not fingerprint {url}: {e}")
+        return None
+    if not (headers.get('ETag') or headers.get('Last-Modified')):
+        return None
+    return {name: headers.get(name) for name in ('ETag', 'Last-Modified', 'Content-Length')}
+
+def fingerprint(inputs, params, code_files):
+    """
+    Key of a stage run: md5 of every input file, the validators of every
+    http(s) input (url_fingerprint), the parameters and the code. Other
+    inputs are taken as they are. The key is None if a url input cannot be
+    fingerprinted.
+    """
+    deps = {}
+    for dep in inputs:
+        if os.path.isfile(dep):
+            deps[dep] = file_md5(dep)
+        elif urlparse(dep).scheme in ('http', 'https'):
+            deps[dep] = url_fingerprint(dep)
+        else:
+            deps[dep] = dep
+    code = {os.path.basename(path): file_md5(path) for path in code_files}
+    if any(value is None for value in deps.values()):
+        return None, deps, code
+    payload = json.dumps({'deps': deps, 'params': params, 'code': code}, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest(), deps, code
+
+def _blob_path(cache_dir, md5):
+    return os.path.join(cache_dir, 'files', 'md5', md5[:2], md5[2:])
+
+def _restore_outputs(outs, cache_dir):
+    """make every recorded output match its md5, copying from the cache if needed"""
+    for path, md5 in outs.items():
+        if os.path.exists(path) and file_md5(path) == md5:
+            continue
+        blob = _blob_path(cache_dir, md5)
+        if not os.path.exists(blob):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(blob, path)
+        logger.debug(f"Restored {path} from the stage cache")
+    return True
+
+def run_stage(stage, func, inputs, outputs, params, code_files, cache_dir=CACHE_DIR, on_hit=None):
+    """
+    Run func() unless a previous run with the same inputs, params and code is
+    recorded in the cache, in which case its outputs are checked (and restored
+    if they were changed or deleted) instead, and on_hit is called with their
+    paths.
+    outputs may be a list of paths or a callable returning one, evaluated
+    after func has run. Outputs are restored as whole files, so they must not
+    be files that other code appends to, like artifact manifests.
+    Returns True on a cache hit. A stage with a url input that cannot be
+    fingerprinted always runs and is not cached.
+    """
+    try:
+        key, deps, code = fingerprint(inputs, params, code_files)
+        if key is None:
+            logger.warning(f"Stage {stage} has inputs that cannot be fingerprinted, running it uncached")
+            func()
+            return False
+        lock_path = os.path.join(cache_dir, f"{stage}.lock.json")
+        if os.path.exists(lock_path):
+            with open(lock_path) as f:
+                lock = json.load(f)
+            if lock['key'] == key and _restore_outputs(lock['outs'], cache_dir):
+                logger.info(f"Stage {stage} is up to date ({key[:12]}), skipping it")
+                if on_hit is not None:
+                    on_hit(list(lock['outs']))
+                return True
+
+        func()
+
+        outs = {}
+        for path in (outputs() if callable(outputs) else outputs):
+            md5 = file_md5(path)
+            blob = _blob_path(cache_dir, md5)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copyfile(path, blob)
+            outs[path] = md5
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(lock_path, 'w') as f:
+            json.dump({'key': key, 'deps': deps, 'params': params, 'code': code, 'outs': outs},
+                      f, indent=2, default=str)
+        logger.debug(f"Stage {stage} outputs cached ({key[:12]})")
+        return False
+    except Exception as e:
+        logger.error(f"Stage cache failed for {stage}: {e}")
+        raise
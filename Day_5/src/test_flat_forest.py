@@ -0,0 +1,38 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from flat_forest import FlatForest, check_parity
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(base_dir, '..', 'spam.csv')
+MODEL_PATHS = [
+    os.path.join(base_dir, '..', 'best_model_rf.joblib'),
+    # written by train_model.py, only there once it has run
+    os.path.join(base_dir, '..', 'spam_model_rf.joblib'),
+]
+
+def tfidf_rows(n_features):
+    """
+    TF-IDF rows of the spam.csv messages with n_features columns, fitted like
+    the notebook vectorizer: sparse, non-negative and l2-normalized, unlike
+    uniform random rows.
+    """
+    messages = pd.read_csv(DATA_PATH, sep='\t')['Message'].str.lower()
+    return TfidfVectorizer(max_features=n_features).fit_transform(messages)
+
+@pytest.mark.parametrize('model_path', MODEL_PATHS, ids=os.path.basename)
+def test_flat_forest_matches_sklearn(model_path, tmp_path):
+    if not os.path.exists(model_path):
+        pytest.skip(f"{model_path} has not been trained")
+    model = joblib.load(model_path)
+    flat_path = str(tmp_path / 'flat.npz')
+    FlatForest.from_sklearn(model).save(flat_path)
+    forest = FlatForest.load(flat_path)
+
+    X = tfidf_rows(model.n_features_in_)
+    check_parity(model, forest, X)
+    # the rows reach many different leaves, not only the first splits
+    assert len(np.unique(forest.apply(X), axis=0)) > X.shape[0] // 2
@@ -0,0 +1,54 @@
+# The text normalization shared by the preprocessing stage and the scoring
+# service. Kept free of pandas/sklearn and of the pipeline stage machinery so
+# the service can import it on its own.
+import string
+from functools import lru_cache
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem.porter import PorterStemmer
+
+# token -> stem cache shared by every preprocessing pass in the process;
+# message corpora repeat the same tokens a lot, so most lookups are hits
+STEM_CACHE_SIZE = 100_000
+
+_stemmer = PorterStemmer()
+_stem = lru_cache(maxsize=STEM_CACHE_SIZE)(_stemmer.stem)
+_stopwords = None
+
+def get_stopwords():
+    """load the english stopwords once and keep them as a frozenset"""
+    global _stopwords
+    if _stopwords is None:
+        _stopwords = frozenset(stopwords.words('english'))
+    return _stopwords
+
+def load_resources():
+    """load the stopwords and the punkt tokenizer now instead of on first use"""
+    get_stopwords()
+    nltk.word_tokenize("warm up")
+
+def stem_cache_info():
+    """hits, misses, maxsize and currsize of the shared stem cache"""
+    return _stem.cache_info()
+
+def normalize_texts(texts):
+    """
+    Normalize a batch of texts (Series or any iterable of str).
+    Returns a list of normalized strings, one per input, in the same order.
+    """
+    stop_words = get_stopwords()
+    punctuation = string.punctuation
+    stem = _stem
+    tokenize = nltk.word_tokenize
+    normalized = []
+    for text in texts:
+        words = [word for word in tokenize(text.lower()) if word.isalnum()]
+        normalized.append(" ".join(
+            stem(word) for word in words
+            if word not in stop_words and word not in punctuation
+        ))
+    return normalized
+
+def transform_text(text):
+    """transform text to lowercase and remove special characters"""
+    return normalize_texts([text])[0]
@@ -0,0 +1,135 @@
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+import argparse
+import mlflow
+import mlflow.sklearn
+
+CHUNK_SIZE = 256 * 1024
+
+
+class ChunkStore:
+    """
+    Content-addressed store for model files, laid out like the DVC cache in
+    Day_4/S3/files/md5/: files are cut into fixed-size chunks, each chunk is
+    stored once, zlib-compressed, under files/sha256/<first 2 hex>/<rest>.
+    A file or directory is described by a small json manifest listing its
+    chunks, so saving the same model (or the same conda.yaml) again costs a
+    hash and a lookup instead of another copy on disk.
+    """
+
+    def __init__(self, root, chunk_size=CHUNK_SIZE, level=6):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.level = level
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.root, "files", "sha256", digest[:2], digest[2:])
+
+    def put_chunk(self, data):
+        """store one chunk unless it is already there, returning its sha256"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, self.level))
+            os.replace(tmp_path, path)
+        return digest
+
+    def get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"chunk {digest} is corrupted")
+        return data
+
+    def put_file(self, path):
+        """{size, sha256, chunks} manifest entry of the file at path"""
+        file_hash = hashlib.sha256()
+        chunks = []
+        size = 0
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                file_hash.update(data)
+                chunks.append(self.put_chunk(data))
+                size += len(data)
+        return {"size": size, "sha256": file_hash.hexdigest(), "chunks": chunks}
+
+    def restore_file(self, entry, path):
+        file_hash = hashlib.sha256()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            for digest in entry["chunks"]:
+                data = self.get_chunk(digest)
+                file_hash.update(data)
+                f.write(data)
+        if file_hash.hexdigest() != entry["sha256"]:
+            raise ValueError(f"{path} does not match its manifest")
+
+    def put_dir(self, path):
+        """manifest of every file under path, keyed by relative posix path"""
+        files = {}
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                file_path = os.path.join(root, name)
+                files[os.path.relpath(file_path, path).replace(os.sep, "/")] = self.put_file(file_path)
+        return {"chunk_size": self.chunk_size, "files": files}
+
+    def restore_dir(self, manifest, path):
+        for name, entry in manifest["files"].items():
+            self.restore_file(entry, os.path.join(path, *name.split("/")))
+
+    def stats(self):
+        """number of chunks and bytes they take on disk"""
+        n_chunks, n_bytes = 0, 0
+        for root, _, names in os.walk(os.path.join(self.root, "files", "sha256")):
+            for name in names:
+                n_chunks += 1
+                n_bytes += os.path.getsize(os.path.join(root, name))
+        return {"chunks": n_chunks, "bytes": n_bytes}
+
+
+def log_model(sk_model, artifact_path, store, **kwargs):
+    """
+    Save sk_model in the MLflow sklearn format into the chunk store and log
+    only its manifest to the active run, as <artifact_path>/manifest.json.
+    kwargs are passed to mlflow.sklearn.save_model.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, "model")
+        mlflow.sklearn.save_model(sk_model, model_dir, **kwargs)
+        manifest = store.put_dir(model_dir)
+    mlflow.log_dict(manifest, f"{artifact_path}/manifest.json")
+    return manifest
+
+
+def load_model(manifest, store):
+    """load a model logged with log_model from its manifest (a dict or a manifest.json path)"""
+    if not isinstance(manifest, dict):
+        with open(manifest) as f:
+            manifest = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        store.restore_dir(manifest, tmp)
+        return mlflow.sklearn.load_model(tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add model directories to a chunk store and report the space saved")
+    parser.add_argument("store", help="chunk store directory")
+    parser.add_argument("model_dirs", nargs="+", help="directories to add, e.g. mlruns/0/models/*/artifacts")
+    args = parser.parse_args()
+
+    store = ChunkStore(args.store)
+    total = 0
+    for model_dir in args.model_dirs:
+        manifest = store.put_dir(model_dir)
+        total += sum(entry["size"] for entry in manifest["files"].values())
+    stats = store.stats()
+    print(f"{total} bytes in {len(args.model_dirs)} directories take {stats['bytes']} bytes as {stats['chunks']} chunks")
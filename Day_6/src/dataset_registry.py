@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import pandas as pd
+import mlflow
+from mlflow.entities import Dataset, DatasetInput, InputTag
+from mlflow.models import infer_signature
+from mlflow.types import Schema
+
+
+class DatasetRegistry:
+    """
+    MLflow dataset records keyed by a fingerprint of the frame they describe.
+    The fingerprint is one vectorized pass of pd.util.hash_pandas_object over
+    the features and target, with no copy of the data; schema and profile are
+    only worked out the first time a fingerprint is seen. With a path, the
+    records are kept in a json file and reused by later runs and processes,
+    so the same frame is always logged as the same (name, digest) dataset.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._datasets = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._datasets = json.load(f)
+
+    @staticmethod
+    def fingerprint(X, y=None):
+        digest = hashlib.blake2b(digest_size=16)
+        for data in (X, y):
+            if data is None:
+                continue
+            digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+            columns = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+            dtypes = list(data.dtypes) if isinstance(data, pd.DataFrame) else [data.dtype]
+            digest.update(repr((columns, [str(dtype) for dtype in dtypes])).encode())
+        return digest.hexdigest()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._datasets, f)
+        os.replace(tmp_path, self.path)
+
+    def dataset(self, X, y=None, name="dataset", source=None):
+        """mlflow Dataset entity for the features X and target y"""
+        fingerprint = self.fingerprint(X, y)
+        key = f"{name}:{fingerprint}"
+        record = self._datasets.get(key)
+        if record is None:
+            # schema of the features followed by the target column, like
+            # mlflow.data.from_pandas on the frame with the target appended
+            signature = infer_signature(X, y)
+            columns = signature.inputs.inputs + (signature.outputs.inputs if y is not None else [])
+            record = {
+                "name": name,
+                "digest": fingerprint[:8],
+                "source_type": "code",
+                "source": json.dumps({"tags": {"mlflow.source.name": source or sys.argv[0]}}),
+                "schema": json.dumps({"mlflow_colspec": Schema(columns).to_dict()}),
+                "profile": json.dumps({"num_rows": len(X), "num_elements": int(X.size) + (len(y) if y is not None else 0)}),
+            }
+            self._datasets[key] = record
+            if self.path:
+                self._save()
+        return Dataset(**record)
+
+    def log_input(self, X, y=None, context="training", name="dataset", run_id=None, client=None):
+        """log X (and y) as an input of run_id, or of the active run"""
+        run_id = run_id or mlflow.active_run().info.run_id
+        client = client or mlflow.MlflowClient()
+        dataset_input = DatasetInput(self.dataset(X, y, name), tags=[InputTag("mlflow.data.context", context)])
+        client.log_inputs(run_id, [dataset_input])
@@ -1,7 +1,24 @@
 import mlflow
 mlflow.set_tracking_uri("http://localhost:5000/")
 import mlflow.sklearn
-mlflow.sklearn.autolog()
+import os
+
+# number of best models serialized once the loop is done (0 logs every model
+# as soon as it is fitted)
+TOP_K_MODELS = int(os.environ.get("TOP_K_MODELS", "1"))
+# set CHUNK_STORE_DIR to keep models as deduplicated chunks instead of a full copy per run
+CHUNK_STORE_DIR = os.environ.get("CHUNK_STORE_DIR")
+# the loop below logs the models itself, autolog would pickle every candidate again
+mlflow.sklearn.autolog(log_models=False)
+from tracking import BufferedTracker
+from leaderboard import Leaderboard
+import chunk_store
+
+# params and metrics below are written in batches from a background thread
+tracker = BufferedTracker()
+
+store = chunk_store.ChunkStore(CHUNK_STORE_DIR) if CHUNK_STORE_DIR else None
+leaderboard = Leaderboard(k=TOP_K_MODELS)
 
 from sklearn.datasets import load_iris
 from sklearn.model_selection import train_test_split
@@ -38,12 +55,18 @@ for md in max_depth:
             rf.fit(X_train, y_train)
             y_pred = rf.predict(X_test)
             accuracy = accuracy_score(y_test, y_pred)
-            mlflow.log_param("max_depth", md)
-            mlflow.log_param("n_estimators", ne)
-            mlflow.log_metric("accuracy", accuracy)
-            mlflow.sklearn.log_model(rf, "model")
+            tracker.log_params({"max_depth": md, "n_estimators": ne})
+            tracker.log_metric("accuracy", accuracy)
+            if TOP_K_MODELS:
+                leaderboard.add(accuracy, mlflow.active_run().info.run_id, rf)
+            elif store is not None:
+                chunk_store.log_model(rf, "model", store)
+            else:
+                mlflow.sklearn.log_model(rf, "model")
             print(f"max_depth: {md}, n_estimators: {ne}, accuracy: {accuracy}")
 
+# only the best models are pickled, into the runs they came from
+leaderboard.log_models("model", store)
 
 
 cm = confusion_matrix(y_test, y_pred)
@@ -57,6 +80,7 @@ plt.savefig("confusion_matrix.png")
 
 mlflow.log_artifact("confusion_matrix.png")
 mlflow.log_artifact(__file__)
+tracker.close()
 
 
 
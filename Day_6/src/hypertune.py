@@ -1,93 +1,108 @@
-from sklearn.model_selection import GridSearchCV
+from search import ParallelGridSearch, HalvingSearch
+from tracking import BufferedTracker
+from run_index import RunIndex
+from dataset_registry import DatasetRegistry
+import chunk_store
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from sklearn.datasets import load_breast_cancer
 import pandas as pd
+import os
+import argparse
 import mlflow
 
-# Explicitly set the tracking URI to the local mlruns directory (project root)
-mlflow.set_tracking_uri("file:///M:/working_25/Practical/Practical/MLOPS/mlruns")
-
-# Diagnostic: List all experiments using workaround for very old MLflow
-from mlflow.tracking import MlflowClient
-client = MlflowClient()
-for i in range(10):
-    try:
-        exp = client.get_experiment(str(i))
-        print(f"Name: {exp.name}, ID: {exp.experiment_id}, Location: {exp.artifact_location}")
-    except Exception as e:
-        pass  # skip if not found
-
-data = load_breast_cancer()
-
-X = pd.DataFrame(data.data, columns=data.feature_names)
-y = pd.Series(data.target, name='target')
-
-X_train, X_test, y_train, y_test = train_test_split(X,y, test_size=0.2, random_state=42)
-
-rf = RandomForestClassifier(random_state=42)
-param_grid = {
-    'n_estimators': [10, 50, 90],
-    'max_depth': [None, 10, 50 ,90]
-}
-
-grid_search = GridSearchCV(estimator=rf, param_grid=param_grid, cv=5, n_jobs=-1, verbose=2)
-
-'''grid_search.fit(X_train, y_train)
-
-best_params = grid_search.best_params_
-best_score = grid_search.best_score_
-
-print(best_params)
-print(best_score)'''
-
-'''mlflow.set_experiment('breast-cancer-rf-hp')
-with mlflow.start_run():
-    grid_search.fit(X_train, y_train)
-    '''
-
 # here we use 12 combinations but in mlflow we have best one 
 # how to log all child runs
 
-
-mlflow.set_experiment('breast-cancer-rf-child')
-
-with mlflow.start_run(run_name="parent_run") as parent:
-    grid_search.fit(X_train, y_train)
-
-    # Log all child runs (all parameter combinations)
-    for i in range(len(grid_search.cv_results_['params'])):
-        with mlflow.start_run(run_name=f"child_run_{i}", nested=True):
-            mlflow.log_params(grid_search.cv_results_['params'][i])
-            mlflow.log_metric("accuracy", grid_search.cv_results_["mean_test_score"][i])
-
-    # Log the best run in the parent
-    best_params = grid_search.best_params_
-    best_score = grid_search.best_score_
-    mlflow.log_params(best_params)
-    mlflow.log_metric("accuracy", best_score)
-
-    train_df= X_train.copy()
-    train_df['target'] = y_train
-
-    train_df = mlflow.data.from_pandas(train_df)
-    mlflow.log_input(train_df, "training")
-
-    test_df= X_test.copy()
-    test_df['target'] = y_test
-
-    test_df = mlflow.data.from_pandas(test_df)
-    mlflow.log_input(test_df, "training")
-
-    mlflow.log_artifact(__file__)
-
-    mlflow.sklearn.log_model(grid_search.best_estimator_,"random_forest")
-
-    mlflow.set_tag("author", "Hanzla Nawaz")
-
-    print(best_params)
-    print(best_score)
-    
-
-        
+def log_child_run(i, params, scores, **rung_info):
+    # called as soon as a combination finishes, while the others still run;
+    # halving search also passes the rung, its budget and whether it was abandoned
+    run_name = f"child_run_{i}" if not rung_info else f"child_run_{i}_rung_{rung_info['rung']}"
+    # queued, the tracker writes the child run in the background
+    with tracker.start_run(run_name=run_name, nested=True):
+        tracker.log_params(params)
+        tracker.log_metric("accuracy", scores.mean())
+        if rung_info:
+            tracker.set_tags(rung_info)
+            tracker.log_metric("folds", len(scores))
+    print(f"[{run_name}] {params} accuracy={scores.mean():.4f} {rung_info}")
+
+# the search runs combinations in worker processes, which re-import this
+# script when they are spawned (Windows), so only the parent process loads
+# the data, sets up tracking and searches
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the breast cancer random forest")
+    parser.add_argument("--search", choices=["grid", "halving"], default="grid",
+                        help="exhaustive grid, or successive halving over the training samples")
+    parser.add_argument("--factor", type=int, default=3,
+                        help="halving: keep 1/factor of the candidates per rung")
+    parser.add_argument("--chunk-store", metavar="DIR",
+                        help="save the model as deduplicated chunks in DIR and log only its manifest")
+    args = parser.parse_args()
+
+    # Explicitly set the tracking URI to the local mlruns directory (project root)
+    mlflow.set_tracking_uri("file:///M:/working_25/Practical/Practical/MLOPS/mlruns")
+
+    data = load_breast_cancer()
+
+    X = pd.DataFrame(data.data, columns=data.feature_names)
+    y = pd.Series(data.target, name='target')
+
+    X_train, X_test, y_train, y_test = train_test_split(X,y, test_size=0.2, random_state=42)
+
+    rf = RandomForestClassifier(random_state=42)
+    param_grid = {
+        'n_estimators': [10, 50, 90],
+        'max_depth': [None, 10, 50 ,90]
+    }
+
+    # Diagnostic: List all experiments from the run index (only changed runs are re-read)
+    index = RunIndex.from_tracking_uri(mlflow.get_tracking_uri())
+    index.refresh()
+    for exp in index.experiments():
+        print(f"Name: {exp['name']}, ID: {exp['experiment_id']}, Location: {exp['artifact_location']}")
+
+    # each combination is cross-validated in worker processes and logged as a
+    # child run when it finishes, instead of all at once after GridSearchCV.fit
+    if args.search == "halving":
+        search = HalvingSearch(estimator=rf, param_grid=param_grid, cv=5, factor=args.factor, n_jobs=-1)
+    else:
+        search = ParallelGridSearch(estimator=rf, param_grid=param_grid, cv=5, n_jobs=-1)
+
+    mlflow.set_experiment('breast-cancer-rf-child')
+    tracker = BufferedTracker()
+    datasets = DatasetRegistry(os.path.join(index.mlruns_dir, ".dataset_registry.json"))
+
+    with mlflow.start_run(run_name="parent_run") as parent:
+        tracker.set_tag("search", args.search)
+        grid_search = search.fit(X_train, y_train, on_result=log_child_run)
+
+        # Log the best run in the parent
+        best_params = grid_search.best_params_
+        best_score = grid_search.best_score_
+        tracker.log_params(best_params)
+        tracker.log_metric("accuracy", best_score)
+
+        # the splits are fingerprinted without copying them, and a frame seen by
+        # an earlier run is logged again from the registry instead of re-profiled
+        datasets.log_input(X_train, y_train, "training")
+        datasets.log_input(X_test, y_test, "training")
+
+        mlflow.log_artifact(__file__)
+
+        if args.chunk_store:
+            chunk_store.log_model(grid_search.best_estimator_, "random_forest", chunk_store.ChunkStore(args.chunk_store))
+        else:
+            mlflow.sklearn.log_model(grid_search.best_estimator_,"random_forest")
+
+        tracker.set_tag("author", "Hanzla Nawaz")
+        # everything queued for the parent and its children is written before it ends
+        tracker.flush()
+
+        print(best_params)
+        print(best_score)
+
+    index.refresh()
+    for run in index.top_k("accuracy", k=3, experiment='breast-cancer-rf-child'):
+        print(f"top run {run['run_name']}: accuracy={run['metric']:.4f} {run['params']}")
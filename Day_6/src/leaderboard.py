@@ -0,0 +1,49 @@
+import heapq
+import itertools
+import mlflow
+import mlflow.sklearn
+import chunk_store
+
+
+class Leaderboard:
+    """
+    The k best fitted models of a search, kept in memory with the run they
+    came from. Models that fall off the board are dropped without ever being
+    pickled; log_models() serializes the survivors into their runs once the
+    search is over.
+    """
+
+    def __init__(self, k=1, greater_is_better=True):
+        self.k = k
+        self.greater_is_better = greater_is_better
+        # min-heap on the sort key, so the worst kept model is popped first
+        self._heap = []
+        self._order = itertools.count()
+
+    def add(self, score, run_id, model):
+        """keep the model if it is among the k best so far, returning whether it was kept"""
+        key = score if self.greater_is_better else -score
+        # on equal scores the earlier model wins, like GridSearchCV
+        entry = (key, -next(self._order), run_id, model, score)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def entries(self):
+        """(score, run_id, model) best first"""
+        return [(score, run_id, model) for _, _, run_id, model, score in sorted(self._heap, reverse=True)]
+
+    def log_models(self, artifact_path="model", store=None, **kwargs):
+        """log each kept model to its run, into the chunk store if one is given"""
+        for rank, (score, run_id, model) in enumerate(self.entries(), start=1):
+            with mlflow.start_run(run_id=run_id):
+                if store is not None:
+                    chunk_store.log_model(model, artifact_path, store, **kwargs)
+                else:
+                    mlflow.sklearn.log_model(model, artifact_path, **kwargs)
+                mlflow.set_tag("leaderboard_rank", rank)
+            print(f"logged model of run {run_id} (rank {rank}, score {score})")
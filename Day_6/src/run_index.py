@@ -0,0 +1,230 @@
+import os
+import argparse
+import sqlite3
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import yaml
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    experiment_id TEXT PRIMARY KEY, name TEXT, artifact_location TEXT, lifecycle_stage TEXT);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, experiment_id TEXT, run_name TEXT, status INTEGER,
+    start_time INTEGER, end_time INTEGER, lifecycle_stage TEXT, parent_run_id TEXT, signature TEXT);
+CREATE TABLE IF NOT EXISTS params (run_id TEXT, key TEXT, value TEXT, PRIMARY KEY (run_id, key));
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT, key TEXT, value REAL, step INTEGER, timestamp INTEGER, PRIMARY KEY (run_id, key));
+CREATE TABLE IF NOT EXISTS tags (run_id TEXT, key TEXT, value TEXT, PRIMARY KEY (run_id, key));
+CREATE INDEX IF NOT EXISTS runs_experiment ON runs (experiment_id);
+CREATE INDEX IF NOT EXISTS params_key_value ON params (key, value);
+CREATE INDEX IF NOT EXISTS metrics_key_value ON metrics (key, value);
+"""
+
+# entries of an experiment directory that are not runs
+NOT_RUNS = {"models", "datasets", "traces", "tags"}
+# RunStatus values written to meta.yaml once a run has ended
+ENDED_STATUSES = {3, 4, 5}
+
+
+def _read_dir(path):
+    """{file name: stripped content} of a params/ or tags/ directory"""
+    values = {}
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            if entry.is_file():
+                with open(entry.path, encoding="utf-8") as f:
+                    values[entry.name] = f.read().strip()
+    return values
+
+
+def _latest_metric(path):
+    """(value, step, timestamp) of the metric with the highest step, then timestamp"""
+    latest = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            timestamp, value = int(parts[0]), float(parts[1])
+            step = int(parts[2]) if len(parts) > 2 else 0
+            if latest is None or (step, timestamp) >= (latest[1], latest[2]):
+                latest = (value, step, timestamp)
+    return latest
+
+
+class RunIndex:
+    """
+    SQLite sidecar over a file-based mlruns/ store: experiments, runs, params,
+    tags and the latest value of every metric, one row each, so queries like
+    "top 5 runs by accuracy where max_depth=10" do not have to open the
+    thousands of small files under mlruns/ every time.
+
+    refresh() only re-reads runs whose meta.yaml or metrics/params/tags
+    directories changed since the last refresh, plus runs that are still
+    running. Values rewritten in place in a finished run are only picked up
+    by refresh(full=True).
+    """
+
+    def __init__(self, mlruns_dir, index_path=None):
+        self.mlruns_dir = mlruns_dir
+        self.index_path = index_path or os.path.join(mlruns_dir, ".run_index.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self.db = sqlite3.connect(self.index_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def from_tracking_uri(cls, tracking_uri, index_path=None):
+        """index for a file:// tracking URI such as the one given to mlflow.set_tracking_uri"""
+        parsed = urlparse(tracking_uri)
+        if parsed.scheme not in ("", "file"):
+            raise ValueError(f"{tracking_uri} is not a file store")
+        return cls(url2pathname(parsed.path) if parsed.scheme else tracking_uri, index_path)
+
+    @staticmethod
+    def _mtimes(run_dir):
+        """modification times of the files and directories a run writes to"""
+        mtimes = []
+        for name in ("meta.yaml", "metrics", "params", "tags"):
+            path = os.path.join(run_dir, name)
+            mtimes.append(str(os.stat(path).st_mtime_ns) if os.path.exists(path) else "-")
+        return ":".join(mtimes)
+
+    def _index_run(self, run_dir, meta):
+        run_id = meta["run_id"]
+        params = _read_dir(os.path.join(run_dir, "params"))
+        tags = _read_dir(os.path.join(run_dir, "tags"))
+        metrics = {}
+        metrics_dir = os.path.join(run_dir, "metrics")
+        if os.path.isdir(metrics_dir):
+            for root, _, files in os.walk(metrics_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    latest = _latest_metric(path)
+                    if latest is not None:
+                        # nested metric names are stored as sub-directories
+                        metrics[os.path.relpath(path, metrics_dir).replace(os.sep, "/")] = latest
+
+        # running runs get no signature, they are re-read on every refresh
+        signature = self._mtimes(run_dir) if meta.get("status") in ENDED_STATUSES else None
+        self.db.execute("DELETE FROM params WHERE run_id = ?", (run_id,))
+        self.db.execute("DELETE FROM metrics WHERE run_id = ?", (run_id,))
+        self.db.execute("DELETE FROM tags WHERE run_id = ?", (run_id,))
+        self.db.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, str(meta["experiment_id"]), tags.get("mlflow.runName", meta.get("run_name")),
+             meta.get("status"), meta.get("start_time"), meta.get("end_time"),
+             meta.get("lifecycle_stage"), tags.get("mlflow.parentRunId"), signature),
+        )
+        self.db.executemany("INSERT INTO params VALUES (?, ?, ?)",
+                            [(run_id, key, value) for key, value in params.items()])
+        self.db.executemany("INSERT INTO tags VALUES (?, ?, ?)",
+                            [(run_id, key, value) for key, value in tags.items()])
+        self.db.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?)",
+                            [(run_id, key, *latest) for key, latest in metrics.items()])
+
+    def refresh(self, full=False):
+        """bring the index up to date with mlruns/, returning the number of runs re-read"""
+        if not os.path.isdir(self.mlruns_dir):
+            return 0
+        known = {row["run_id"]: row["signature"] for row in self.db.execute("SELECT run_id, signature FROM runs")}
+        seen_experiments, seen_runs = set(), set()
+        updated = 0
+        with self.db:
+            for exp_entry in os.scandir(self.mlruns_dir):
+                exp_meta_path = os.path.join(exp_entry.path, "meta.yaml")
+                if not exp_entry.is_dir() or exp_entry.name.startswith(".") or not os.path.exists(exp_meta_path):
+                    continue
+                with open(exp_meta_path, encoding="utf-8") as f:
+                    exp_meta = yaml.safe_load(f) or {}
+                if "experiment_id" not in exp_meta:
+                    continue
+                experiment_id = str(exp_meta["experiment_id"])
+                seen_experiments.add(experiment_id)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO experiments VALUES (?, ?, ?, ?)",
+                    (experiment_id, exp_meta.get("name"), exp_meta.get("artifact_location"),
+                     exp_meta.get("lifecycle_stage")),
+                )
+                for run_entry in os.scandir(exp_entry.path):
+                    if not run_entry.is_dir() or run_entry.name in NOT_RUNS:
+                        continue
+                    run_id = run_entry.name
+                    seen_runs.add(run_id)
+                    signature = known.get(run_id)
+                    if not full and signature is not None and signature == self._mtimes(run_entry.path):
+                        continue
+                    meta_path = os.path.join(run_entry.path, "meta.yaml")
+                    if not os.path.exists(meta_path):
+                        continue
+                    with open(meta_path, encoding="utf-8") as f:
+                        meta = yaml.safe_load(f) or {}
+                    if "run_id" not in meta:
+                        continue
+                    self._index_run(run_entry.path, meta)
+                    updated += 1
+
+            # drop what was deleted from disk
+            for run_id in set(known) - seen_runs:
+                for table in ("runs", "params", "metrics", "tags"):
+                    self.db.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+            for row in self.db.execute("SELECT experiment_id FROM experiments").fetchall():
+                if row["experiment_id"] not in seen_experiments:
+                    self.db.execute("DELETE FROM experiments WHERE experiment_id = ?", (row["experiment_id"],))
+        return updated
+
+    def experiments(self):
+        return [dict(row) for row in self.db.execute(
+            "SELECT * FROM experiments WHERE lifecycle_stage = 'active' ORDER BY name")]
+
+    def _experiment_ids(self, experiment):
+        rows = self.db.execute("SELECT experiment_id FROM experiments WHERE experiment_id = ? OR name = ?",
+                               (str(experiment), str(experiment))).fetchall()
+        return [row["experiment_id"] for row in rows]
+
+    def top_k(self, metric, k=5, experiment=None, params=None, ascending=False):
+        """
+        The k active runs with the best latest value of metric, optionally
+        limited to one experiment (name or id) and to runs whose params equal
+        the given values (compared as strings, like MLflow stores them).
+        """
+        query = ["SELECT r.run_id, r.run_name, r.experiment_id, r.parent_run_id, m.value AS metric",
+                 "FROM runs r JOIN metrics m ON m.run_id = r.run_id AND m.key = ?",
+                 "WHERE r.lifecycle_stage = 'active'"]
+        args = [metric]
+        if experiment is not None:
+            ids = self._experiment_ids(experiment)
+            query.append(f"AND r.experiment_id IN ({', '.join('?' * len(ids)) or 'NULL'})")
+            args += ids
+        for key, value in (params or {}).items():
+            query.append("AND EXISTS (SELECT 1 FROM params p WHERE p.run_id = r.run_id AND p.key = ? AND p.value = ?)")
+            args += [key, str(value)]
+        query.append(f"ORDER BY m.value {'ASC' if ascending else 'DESC'}, r.start_time LIMIT ?")
+        args.append(k)
+        runs = [dict(row) for row in self.db.execute(" ".join(query), args)]
+        for run in runs:
+            run["params"] = dict(self.db.execute("SELECT key, value FROM params WHERE run_id = ?",
+                                                 (run["run_id"],)).fetchall())
+        return runs
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the runs of a file-based mlruns/ store")
+    parser.add_argument("mlruns_dir")
+    parser.add_argument("--metric", default="accuracy")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--experiment", help="experiment name or id")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="only runs with this param value (can be repeated)")
+    parser.add_argument("--ascending", action="store_true", help="lower metric values are better")
+    parser.add_argument("--full", action="store_true", help="re-read every run instead of only changed ones")
+    args = parser.parse_args()
+
+    index = RunIndex(args.mlruns_dir)
+    print(f"{index.refresh(full=args.full)} runs re-read")
+    params = dict(param.split("=", 1) for param in args.param)
+    for run in index.top_k(args.metric, args.k, args.experiment, params, args.ascending):
+        print(f"{run['metric']:.6f} {run['run_id']} {run['run_name']} {run['params']}")
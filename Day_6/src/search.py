@@ -0,0 +1,232 @@
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.base import clone, is_classifier
+from sklearn.model_selection import ParameterGrid, check_cv, cross_val_score
+from sklearn.utils import _safe_indexing, resample
+
+# training data of the current search, set once per worker process
+_data = {}
+
+
+def evaluate_candidate(estimator, params, X, y, cv):
+    """cross-validation scores of one parameter combination (runs in a worker process)"""
+    return cross_val_score(clone(estimator).set_params(**params), X, y, cv=cv)
+
+
+def _init_data(X, y):
+    _data['X'], _data['y'] = X, y
+
+
+def evaluate_fold(estimator, params, train, test):
+    """score of one parameter combination on one cv fold (runs in a worker process)"""
+    X, y = _data['X'], _data['y']
+    model = clone(estimator).set_params(**params)
+    model.fit(_safe_indexing(X, train), _safe_indexing(y, train))
+    return model.score(_safe_indexing(X, test), _safe_indexing(y, test))
+
+
+class ParallelGridSearch:
+    """
+    Exhaustive search over param_grid like GridSearchCV, but every combination
+    is evaluated as its own task on a process pool and on_result(index, params,
+    scores) is called in the parent as soon as that combination finishes, so
+    results can be logged while the search is still running.
+
+    best_params_, best_score_, best_index_, best_estimator_ and the
+    params / mean_test_score / std_test_score / rank_test_score entries of
+    cv_results_ match GridSearchCV with the same estimator, grid and cv.
+    """
+
+    def __init__(self, estimator, param_grid, cv=5, n_jobs=None, refit=True):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.refit = refit
+
+    def fit(self, X, y, on_result=None):
+        candidates = list(ParameterGrid(self.param_grid))
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        split_scores = [None] * len(candidates)
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(candidates))) as pool:
+            futures = {
+                pool.submit(evaluate_candidate, self.estimator, params, X, y, self.cv): i
+                for i, params in enumerate(candidates)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                split_scores[i] = future.result()
+                if on_result is not None:
+                    on_result(i, candidates[i], split_scores[i])
+
+        split_scores = np.array(split_scores)
+        means = split_scores.mean(axis=1)
+        # ties go to the first combination in grid order, as in GridSearchCV
+        ranks = np.array([1 + np.sum(means > mean) for mean in means], dtype=np.int32)
+        self.cv_results_ = {
+            "params": candidates,
+            "mean_test_score": means,
+            "std_test_score": split_scores.std(axis=1),
+            "rank_test_score": ranks,
+            **{f"split{k}_test_score": split_scores[:, k] for k in range(split_scores.shape[1])},
+        }
+        self.best_index_ = int(ranks.argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = means[self.best_index_]
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+
+class HalvingSearch:
+    """
+    Successive halving over param_grid: every combination is first scored on a
+    small budget, then only the best 1/factor of them move on to the next rung
+    with factor times more budget, until the last rung uses the full budget.
+    The budget (resource) is the number of training samples by default, or an
+    estimator parameter such as 'n_estimators', which must then not be part of
+    param_grid.
+
+    Within a rung, each cv fold is a separate task on a process pool. Once a
+    combination has min_folds fold scores, it is abandoned (its remaining
+    folds are cancelled) if its running mean is more than abandon_margin below
+    the score it would need to be promoted. abandon_margin=None disables that.
+
+    on_result(index, params, scores, rung=..., n_resources=..., abandoned=...)
+    is called for every evaluated combination of every rung as it finishes.
+    best_params_ and best_score_ come from the last rung.
+    """
+
+    def __init__(self, estimator, param_grid, cv=5, factor=3, resource='n_samples',
+                 min_resources=None, max_resources=None, min_folds=2, abandon_margin=0.02,
+                 n_jobs=None, refit=True, random_state=42):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.factor = factor
+        self.resource = resource
+        self.min_resources = min_resources
+        self.max_resources = max_resources
+        self.min_folds = min_folds
+        self.abandon_margin = abandon_margin
+        self.n_jobs = n_jobs
+        self.refit = refit
+        self.random_state = random_state
+
+    def _schedule(self, n_candidates, n_samples, n_classes, n_splits):
+        """budget of every rung, growing by factor up to max_resources"""
+        if self.resource == 'n_samples':
+            max_resources = self.max_resources or n_samples
+            # every class needs a few samples in every fold
+            min_resources = self.min_resources or 2 * n_splits * n_classes
+        else:
+            max_resources = self.max_resources or self.estimator.get_params()[self.resource]
+            min_resources = self.min_resources or 1
+        n_rungs = 1
+        while n_candidates > 1:
+            n_candidates = math.ceil(n_candidates / self.factor)
+            n_rungs += 1
+        while n_rungs > 1 and max_resources / self.factor ** (n_rungs - 1) < min_resources:
+            n_rungs -= 1
+        return [int(max_resources / self.factor ** (n_rungs - 1 - r)) for r in range(n_rungs)]
+
+    def _run_rung(self, pool, rung, n_resources, order, candidates, y, n_keep, on_result):
+        """evaluate the combinations in order on this rung, returning {index: mean} of the completed ones"""
+        samples = np.arange(len(y))
+        if self.resource == 'n_samples' and n_resources < len(y):
+            samples = resample(samples, n_samples=n_resources, replace=False, stratify=y,
+                               random_state=self.random_state)
+        cv = check_cv(self.cv, _safe_indexing(y, samples), classifier=is_classifier(self.estimator))
+        splits = [(samples[train], samples[test])
+                  for train, test in cv.split(samples, _safe_indexing(y, samples))]
+
+        evaluated = {}
+        for i in order:
+            params = dict(candidates[i])
+            if self.resource != 'n_samples':
+                params[self.resource] = n_resources
+            evaluated[i] = params
+
+        # candidates are queued best first (previous rung order), so the bar
+        # to beat is known early and weak candidates can be dropped mid-cv
+        futures = {}
+        by_candidate = {i: [] for i in order}
+        for i in order:
+            for k, (train, test) in enumerate(splits):
+                future = pool.submit(evaluate_fold, self.estimator, evaluated[i], train, test)
+                futures[future] = (i, k)
+                by_candidate[i].append(future)
+
+        fold_scores = {i: {} for i in order}
+        completed, abandoned = {}, set()
+        for future in as_completed(futures):
+            i, k = futures[future]
+            if future.cancelled() or i in abandoned:
+                continue
+            fold_scores[i][k] = future.result()
+            scores = np.array([fold_scores[i][k] for k in sorted(fold_scores[i])])
+            if len(scores) == len(splits):
+                completed[i] = scores.mean()
+            elif self._should_abandon(scores, completed, n_keep):
+                abandoned.add(i)
+                for pending in by_candidate[i]:
+                    pending.cancel()
+            else:
+                continue
+            self._record(i, evaluated[i], scores, rung, n_resources, i in abandoned)
+            if on_result is not None:
+                on_result(i, evaluated[i], scores, rung=rung, n_resources=n_resources,
+                          abandoned=i in abandoned)
+        return completed
+
+    def _should_abandon(self, scores, completed, n_keep):
+        """whether a partially scored combination is already out of the running"""
+        if self.abandon_margin is None or len(scores) < self.min_folds or len(completed) < n_keep:
+            return False
+        # mean score the combination has to reach to be promoted
+        bar = sorted(completed.values(), reverse=True)[n_keep - 1]
+        return scores.mean() < bar - self.abandon_margin
+
+    def _record(self, i, params, scores, rung, n_resources, abandoned):
+        results = self.cv_results_
+        results['candidate'].append(i)
+        results['params'].append(params)
+        results['iter'].append(rung)
+        results['n_resources'].append(n_resources)
+        results['n_folds'].append(len(scores))
+        results['mean_test_score'].append(scores.mean())
+        results['std_test_score'].append(scores.std())
+        results['abandoned'].append(abandoned)
+
+    def fit(self, X, y, on_result=None):
+        candidates = list(ParameterGrid(self.param_grid))
+        if self.resource != 'n_samples' and any(self.resource in params for params in candidates):
+            raise ValueError(f"{self.resource} is the halving resource and cannot be searched over")
+        n_splits = check_cv(self.cv, y, classifier=is_classifier(self.estimator)).get_n_splits()
+        n_classes = len(np.unique(y)) if is_classifier(self.estimator) else 1
+        self.n_resources_ = self._schedule(len(candidates), len(y), n_classes, n_splits)
+        self.n_candidates_ = []
+        self.cv_results_ = {key: [] for key in ('candidate', 'params', 'iter', 'n_resources', 'n_folds',
+                                                'mean_test_score', 'std_test_score', 'abandoned')}
+
+        n_jobs = os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+        order = list(range(len(candidates)))
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_data, initargs=(X, y)) as pool:
+            for rung, n_resources in enumerate(self.n_resources_):
+                self.n_candidates_.append(len(order))
+                last = rung == len(self.n_resources_) - 1
+                n_keep = 1 if last else math.ceil(len(order) / self.factor)
+                completed = self._run_rung(pool, rung, n_resources, order, candidates, y, n_keep, on_result)
+                # ties go to the first combination in grid order
+                order = sorted(completed, key=lambda i: (-completed[i], i))[:n_keep]
+
+        self.best_index_ = order[0]
+        self.best_score_ = completed[self.best_index_]
+        self.best_params_ = candidates[self.best_index_]
+        if self.resource != 'n_samples':
+            self.best_params_ = {**self.best_params_, self.resource: self.n_resources_[-1]}
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
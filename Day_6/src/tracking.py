@@ -0,0 +1,164 @@
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+# MLflow rejects log_batch calls above these sizes
+MAX_PARAMS_TAGS_PER_BATCH = 100
+MAX_METRICS_PER_BATCH = 1000
+
+
+class BufferedTracker:
+    """
+    Queues params, metrics and tags and writes them from a background thread
+    with one MlflowClient.log_batch call per run and flush, instead of one
+    request (or one small file in mlruns/) per log_param / log_metric call.
+
+    Calls go to the innermost run opened with start_run(), else to the active
+    mlflow run at the time of the call. Runs opened with start_run() are
+    ended from the queue after their data is written, and marked FAILED if
+    the block raised. Everything still queued is written by flush(), close(),
+    or at interpreter exit.
+    """
+
+    def __init__(self, client=None, flush_interval_s=0.5):
+        self.client = client or MlflowClient()
+        self.flush_interval_s = flush_interval_s
+        self._queue = queue.Queue()
+        self._runs = []
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._work, name="mlflow-tracker", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run_id(self, run_id):
+        if run_id is not None:
+            return run_id
+        if self._runs:
+            return self._runs[-1].run_id
+        active = mlflow.active_run()
+        if active is None:
+            raise RuntimeError("no active run to log to")
+        return active.info.run_id
+
+    def log_params(self, params, run_id=None):
+        run_id = self._run_id(run_id)
+        for key, value in params.items():
+            self._queue.put(("param", run_id, Param(key, str(value))))
+
+    def log_param(self, key, value, run_id=None):
+        self.log_params({key: value}, run_id)
+
+    def log_metrics(self, metrics, step=0, run_id=None):
+        run_id = self._run_id(run_id)
+        timestamp = int(time.time() * 1000)
+        for key, value in metrics.items():
+            self._queue.put(("metric", run_id, Metric(key, float(value), timestamp, step)))
+
+    def log_metric(self, key, value, step=0, run_id=None):
+        self.log_metrics({key: value}, step, run_id)
+
+    def set_tags(self, tags, run_id=None):
+        run_id = self._run_id(run_id)
+        for key, value in tags.items():
+            self._queue.put(("tag", run_id, RunTag(key, str(value))))
+
+    def set_tag(self, key, value, run_id=None):
+        self.set_tags({key: value}, run_id)
+
+    @contextmanager
+    def start_run(self, run_name=None, nested=False, tags=None, experiment_id=None):
+        """
+        Create a run (a child of the active one if nested) and yield its id.
+        Only the creation is synchronous, the run is ended from the queue.
+        """
+        active = mlflow.active_run()
+        parent = self._runs[-1] if self._runs else (active.info if active else None)
+        tags = dict(tags or {})
+        if nested and parent:
+            tags["mlflow.parentRunId"] = parent.run_id
+        if experiment_id is None:
+            experiment_id = parent.experiment_id if parent else mlflow.tracking.fluent._get_experiment_id()
+        info = self.client.create_run(experiment_id, tags=tags, run_name=run_name).info
+        self._runs.append(info)
+        status = "FINISHED"
+        try:
+            yield info.run_id
+        except BaseException:
+            status = "FAILED"
+            raise
+        finally:
+            self._runs.remove(info)
+            self._queue.put(("end", info.run_id, status))
+
+    def _work(self):
+        while True:
+            # gather what arrives within flush_interval_s into one write,
+            # or less if flush() is waiting
+            ops = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while ops[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(ops)
+            except Exception as e:
+                # surfaced by the next flush() or close()
+                self._error = self._error or e
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+
+    def _write(self, ops):
+        batches = {}
+        ended = []
+        for kind, run_id, item in ops:
+            if kind == "flush":
+                continue
+            if kind == "end":
+                ended.append((run_id, item))
+                continue
+            params, metrics, tags = batches.setdefault(run_id, ({}, [], {}))
+            if kind == "param":
+                params[item.key] = item
+            elif kind == "metric":
+                metrics.append(item)
+            else:
+                tags[item.key] = item
+        for run_id, (params, metrics, tags) in batches.items():
+            params, tags = list(params.values()), list(tags.values())
+            while params or metrics or tags:
+                self.client.log_batch(run_id, metrics=metrics[:MAX_METRICS_PER_BATCH],
+                                      params=params[:MAX_PARAMS_TAGS_PER_BATCH],
+                                      tags=tags[:MAX_PARAMS_TAGS_PER_BATCH])
+                params = params[MAX_PARAMS_TAGS_PER_BATCH:]
+                metrics = metrics[MAX_METRICS_PER_BATCH:]
+                tags = tags[MAX_PARAMS_TAGS_PER_BATCH:]
+        # runs are ended only after everything queued for them is written
+        for run_id, status in ended:
+            self.client.set_terminated(run_id, status)
+
+    def flush(self):
+        """block until everything queued so far is written"""
+        self._queue.put(("flush", None, None))
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self.flush()